@@ -6,245 +6,209 @@ which means documents and nodes can be shared with C/C++ code/objects directly.
 
 import ctypes
 import sys
-from PyQt5.QtWidgets import (
-    QApplication, 
-    QFileDialog
-)
+import threading
+import numpy
 from numpy import array
 # import MessageBox as M
 import utils
-
-class PointerPtr(ctypes.Structure):
-    _fields_ = [
-        ("ptr",ctypes.c_void_p),        #    pointer
-    ]
-
-class xmlDoc(ctypes.Structure):
-    _fields_ = [
-        ("_private",ctypes.c_void_p),   #    application data
-        ("type",ctypes.c_uint16),       #    XML_DOCUMENT_NODE, must be second !
-        ("name",ctypes.c_char_p),       #    name/filename/URI of the document
-        ("children",ctypes.c_void_p),   #    the document tree
-        ("last",ctypes.c_void_p),       #    last child link
-        ("parent",ctypes.c_void_p),     #    child->parent link
-        ("next",ctypes.c_void_p),       #    next sibling link
-        ("prev",ctypes.c_void_p),       #    previous sibling link
-        ("doc",ctypes.c_void_p),        #    autoreference to itself End of common part
-        ("compression",ctypes.c_int),   #    level of zlib compression
-        ("standalone",ctypes.c_int),    #    standalone document (no external refs) 1 if standalone="yes" 0 if sta
-        ("intSubset",ctypes.c_void_p),  #    the document internal subset
-        ("extSubset",ctypes.c_void_p),  #    the document external subset
-        ("oldNs",ctypes.c_void_p),      #    Global namespace, the old way
-        ("version",ctypes.c_char_p),    #    the XML version string
-        ("encoding",ctypes.c_char_p),   #    external initial encoding, if any
-        ("ids",ctypes.c_void_p),        #    Hash table for ID attributes if any
-        ("refs",ctypes.c_void_p),       #    Hash table for IDREFs attributes if any
-        ("URL",ctypes.c_char_p),        #    The URI for that document
-        ("charset",ctypes.c_int),       #    Internal flag for charset handling, actually an xmlCharEncoding
-        ("dict",ctypes.c_void_p),       #    dict used to allocate names or NULL
-        ("psvi",ctypes.c_void_p),       #    for type/PSVI information
-        ("parseFlags",ctypes.c_int),    #    set of xmlParserOption used to parse the document
-        ("properties",ctypes.c_int),    #    set of xmlDocProperties for this document set at the end of parsing
-    ]
-
-class xmlNode(ctypes.Structure):
-    _fields_ = [
-        ("_private",ctypes.c_void_p),   #    application data
-        ("type",ctypes.c_int16),        #    type number, must be second !
-        ("name",ctypes.c_char_p),       #    the name of the node, or the entity
-        ("children",ctypes.c_void_p),   #    parent->childs link
-        ("last",ctypes.c_void_p),       #    last child link
-        ("parent",ctypes.c_void_p),     #    child->parent link
-        ("next",ctypes.c_void_p),       #    next sibling link
-        ("prev",ctypes.c_void_p),       #    previous sibling link
-        ("doc",ctypes.c_void_p),        #    the containing document End of common part
-        ("ns",ctypes.c_void_p),         #    pointer to the associated namespace
-        ("content",ctypes.c_void_p),    #    the content
-        ("properties",ctypes.c_char_p), #    properties list
-        ("nsDef",ctypes.c_char_p),      #    namespace definitions on this node
-        ("psvi",ctypes.c_void_p),       #    for type/PSVI information
-        ("line",ctypes.c_uint16),       #    line number
-        ("extra",ctypes.c_uint16),      #    extra data for XPath/XSLT
-    ]
-
-class xmlError(ctypes.Structure):
-    _fields_ = [
-        ("domain",ctypes.c_int),        #    What part of the library raised this error
-        ("code",ctypes.c_int),          #    The error code, e.g. an xmlParserError
-        ("message",ctypes.c_char_p),    #    human-readable informative error message
-        ("level",ctypes.c_uint32),      #    how consequent is the error
-        ("file",ctypes.c_char_p),       #    the filename
-        ("line",ctypes.c_int),          #    the line number if available
-        ("str1",ctypes.c_char_p),       #    extra string information
-        ("str2",ctypes.c_char_p),       #    extra string information
-        ("str3",ctypes.c_char_p),       #    extra string information
-        ("int1",ctypes.c_int),          #    extra number information
-        ("int2",ctypes.c_int),          #    error column # or 0 if N/A (todo: rename field when we would brk ABI)
-        ("ctxt",ctypes.c_void_p),       #    the parser context if available
-        ("node",ctypes.c_void_p),       #    the node in the tree
-    ]
-
-class xmlXPathParserContext(ctypes.Structure):
-    _fields_ = [
-        ("cur",ctypes.c_char_p),        #    the current char being parsed
-        ("base",ctypes.c_void_p),       #    the full expression
-        ("error",ctypes.c_int),         #    error code
-        ("context",ctypes.c_char_p),    #    the evaluation context
-        ("value",ctypes.c_char_p),      #    the current value
-        ("valueNr",ctypes.c_int),       #    number of values stacked
-        ("valueMax",ctypes.c_int),      #    max number of values stacked
-        ("valueTab",ctypes.c_char_p),   #    stack of values
-        ("comp",ctypes.c_char_p),       #    the precompiled expression
-        ("xptr",ctypes.c_int),          #    it this an XPointer expression
-        ("ancestor",ctypes.c_char_p),   #    used for walking preceding axis
-        ("valueFrame",ctypes.c_int),    #    used to limit Pop on the stack
-    ]
-
-class xmlXPathObject(ctypes.Structure):
-    _fields_ = [
-        ("type",ctypes.c_char_p), 
-        ("nodesetval",ctypes.c_void_p), 
-        ("boolval",ctypes.c_int), 
-        ("floatval",ctypes.c_double), 
-        ("stringval",ctypes.c_void_p), 
-        ("user",ctypes.c_void_p), 
-        ("index",ctypes.c_int), 
-        ("user2",ctypes.c_void_p), 
-        ("index2",ctypes.c_int), 
-    ]
-
-class xmlNodeSet(ctypes.Structure):
-    _fields_ = [
-        ("nodeNr",ctypes.c_int),        #    number of nodes in the set
-        ("nodeMax",ctypes.c_int),       #    size of the array as allocated
-        ("nodeTab",ctypes.c_void_p),    #    array of nodes in no particular order @@ with_ns to check whether nam
-    ]
-
-if utils.os == 'Linux':
-    if utils.x64: libXmlPath = "/usr/lib64/libxml2.so.2"
-    else: libXmlPath = "/usr/lib/libxml2.so.2"
-else:
-    libXmlPath = "C:\\Users\\dholstein\\Documents\\XML\\lib\\libxml2.dll"
-libXML = None
-
-class NullDLL(Exception):
-    """Exception raised if "libXML = None"
-
-    Attributes:
-        message -- explanation of the error
-    """
-
-    def __init__(self, message="DLL not loaded"):
-        self.message = message
-        super().__init__(self.message)
-
-class xmlNullPtr(Exception):
-    """Exception raised if "xmlDocPtr = NULL"
-
-    Attributes:
-        message -- explanation of the error
-    """
-
-    def __init__(self, message="XML Document pointer may not be NULL"):
-        self.message = message
-        super().__init__(self.message)
-
-class LibErr(Exception):
-    """Exception raised if xmlError is not NULL
-
-    Attributes:
-        err -- XML error structure
-    """
-
-    def __init__(self, err=None):
-        if err == None:
-            self.message = "undefined libxml2 error"
-        else:
-            e = err.contents
-            self.message = e.file.decode("utf-8") + " line:" + str(e.line) + " msg:" + e.message.decode("utf-8")
-        super().__init__(self.message)
+from LibXmlBind import *    #   structures, exceptions, SetLibXmlPath and the pre-bound "xml2" functions
 
 def xmlGetLastError () -> xmlError:
 # Get the last global error registered. This is per thread if compiled with thread support.
 # Returns:	NULL if no error occurred or a pointer to the error
+#   Note: the error is sticky (never reset), the wrappers use xmlCaptureErrors() instead.
 
-    global libXML
-# Check if DLL into memory. 
-    if libXML == None: raise NullDLL()
-
-# set up prototype
-    libXML.xmlGetLastError.restype = ctypes.POINTER(xmlError) # correct return type
-
-# wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    ErrPtr = libXML.xmlGetLastError()
+    ErrPtr = xml2.xmlGetLastError()
     if ErrPtr: return ErrPtr
     else: return None
 
-def SetLibXmlPath(path: str):
-    global libXmlPath
-    libXmlPath = path
+class xmlErrorState():   #   a thread's collectors, attribute access on it is much cheaper than on a threading.local
+    __slots__ = ("errors", "saved")     #   the innermost open operation's list (None: none open), the outer ones'
+
+xmlErrors = threading.local()   #   per thread: "state", an xmlErrorState
+
+@xmlStructuredErrorFunc
+def xmlErrorHandler(userData, err):
+# libxml2 structured error callback, runs in the thread that raised the error.
+# Outside any operation the error is printed to stderr, as libxml2 does without a handler.
+    state = getattr(xmlErrors, "state", None)
+    errors = state.errors if state != None else None
+    if errors == None: print(LibErr(err), file=sys.stderr)
+    else:
+        if len(errors) >= 64: del errors[0]     #   keep the last ones, a recovering parse can report thousands
+        errors.append(LibErr(err))
+
+def _xmlErrorsSetup() -> xmlErrorState:     #   first collector of the thread: install the handler, it's per thread in libxml2
+    xml2.xmlSetStructuredErrorFunc(None, xmlErrorHandler)
+    state = xmlErrors.state = xmlErrorState()
+    state.errors, state.saved = None, []
+    return state
+
+class xmlErrorScope():
+# Collector of one operation's errors, see xmlCaptureErrors(). Entering it makes it the thread's innermost collector,
+# leaving it restores the previous one; it can be entered again (a generator around each of its libxml2 calls).
+    def __init__(self, errors: list = None):
+        self.errors = errors    #   None: a new list on each entry
+
+    def __enter__(self) -> list:
+        try: state = xmlErrors.state
+        except AttributeError: state = _xmlErrorsSetup()
+        state.saved.append(state.errors)
+        errors = state.errors = [] if self.errors == None else self.errors
+        return errors
+
+    def __exit__(self, *exc):
+        state = xmlErrors.state
+        state.errors = state.saved.pop()
+
+xmlCapture = xmlErrorScope()    #   the scope of xmlCaptureErrors(), it holds no state
+
+def xmlCaptureErrors (errors: list = None) -> xmlErrorScope:
+# Collect the current thread's errors for one operation (the handler is per thread in libxml2):
+#     with xmlCaptureErrors() as errors:
+#         pDoc = xml2.xmlReadFile(...)
+#     if not pDoc: xmlRaiseErrors(errors)
+# Collectors nest, an operation run inside another one (or between the steps of a generator) keeps its own errors.
+# The hot wrappers (xmlReadFile, xmlReadMemory, xml.XPathEval) do the same inline: save the state's "errors", set
+# a new list, restore it.
+#     errors:	the list to append to (e.g. a generator's), a new one by default
+    return xmlCapture if errors == None else xmlErrorScope(errors)
+
+@xsltGenericErrorFunc
+def xsltErrorHandler(userData, format, arg):
+# libxslt's (printf style) error callback. libxslt formats its messages itself and reports them as "%s", msg;
+# other formats (the "file %s line %d" location lines) can't be expanded from a ctypes callback and are skipped.
+    state = getattr(xmlErrors, "state", None)
+    errors = state.errors if state != None else None
+    if errors == None or format != b"%s" or not arg: return
+    err = LibErr(ctypes.string_at(arg).decode("utf-8", "replace").rstrip())
+    err.level = XML_ERR_LEVEL.ERROR
+    if len(errors) >= 64: del errors[0]
+    errors.append(err)
+
+xsltErrorsInstalled = False
+
+def xsltCaptureErrors (errors: list = None) -> xmlErrorScope:
+# xmlCaptureErrors() for libxslt calls, libxslt's error function is process wide (it reports to the calling thread)
+    global xsltErrorsInstalled
+    if not xsltErrorsInstalled:
+        xslt.xsltSetGenericErrorFunc(None, xsltErrorHandler)
+        xsltErrorsInstalled = True
+    return xmlCaptureErrors(errors)
+
+def xmlRaiseErrors (errors: list):
+# raise the most severe collected error, for an operation that failed (returned NULL)
+    if errors: raise max(errors, key=lambda e: e.level)
+    raise LibErr()
 
 def xmlReadFile (filename: str, encoding: str, options) -> xmlDoc:
 # parse an XML file from the filesystem or the network.
 #         filename:	a file or URL
 #         encoding:	the document encoding, or NULL
-#         options:	a combination of xmlParserOption
+#         options:	a combination of xmlParserOption, or an xmlParseProfiles name
 #         Returns:	the resulting document tree
-    
-    global libXML
-# Load DLL into memory. 
-    if libXML == None:
-        global libXmlPath
-        if utils.os == 'Linux': libXML = ctypes.CDLL (libXmlPath)
-        else: libXML = ctypes.WinDLL (libXmlPath)
-
-# set up prototype
-    libXML.xmlReadFile.restype = ctypes.POINTER(xmlDoc) # correct return type
-    libXML.xmlReadFile.argtypes = ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int32
 
 # wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    pDoc = libXML.xmlReadFile(filename.encode(), encoding.encode(), options)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
+    try: state = xmlErrors.state    #   xmlCaptureErrors() inline
+    except AttributeError: state = _xmlErrorsSetup()
+    prev, state.errors = state.errors, []
+    try:
+        if not xmlMem.enabled: pDoc = xml2.xmlReadFile(filename.encode(), encoding.encode(), xmlParseOptions(options))
+        else:
+            with xmlMemDocTag(filename) as t: pDoc = t.doc(xml2.xmlReadFile(filename.encode(), encoding.encode(), xmlParseOptions(options)))
+    finally: errors, state.errors = state.errors, prev
+    if not pDoc: xmlRaiseErrors(errors)
     return pDoc # return xmlDocPtr (xmlDoc*). Add ".contents" in calling program to dereference.
 
-def xmlReadMemory (XML: str, URL: str, encoding: str, options) -> xmlDoc:
+def BufferPtr(data) -> tuple:
+# Native pointer and byte length of a str or buffer-protocol object (bytes, bytearray, memoryview, mmap, numpy...)
+#     data:	the input, only str is copied (encoded to UTF-8)
+#     Returns:	(pointer, size, owner), keep "owner" referenced while libxml2 uses the pointer.
+    if isinstance(data, str): data = data.encode()
+    if isinstance(data, bytes): return data, len(data), data   #   ctypes passes the bytes' own storage
+    a = numpy.frombuffer(data, numpy.uint8)     #   zero-copy view, works for read-only buffers (mmap.ACCESS_READ)
+    if a.size == 0: return None, 0, a
+    return a.ctypes.data, a.size, a
+
+def xmlReadMemory (XML, URL: str, encoding: str, options) -> xmlDoc:
 # parse an XML in-memory document and build a tree.
-#     buffer:   a pointer to a char array
-#     size:	    the size of the array
+#     XML:      str, or any buffer-protocol object (bytes, bytearray, memoryview, mmap) passed without copying
 #     URL:	    the base URL to use for the document
 #     encoding:	the document encoding, or NULL
-#     options:	a combination of xmlParserOption
+#     options:	a combination of xmlParserOption, or an xmlParseProfiles name
 #     Returns:	the resulting document tree
-    
-    global libXML
-# Load DLL into memory. 
-    if libXML == None:
-        global libXmlPath
-        if utils.os == 'Linux': libXML = ctypes.CDLL (libXmlPath)
-        else: libXML = ctypes.WinDLL (libXmlPath)
-
-# set up prototype
-    libXML.xmlReadMemory.restype = ctypes.POINTER(xmlDoc) # correct return type
-    libXML.xmlReadMemory.argtypes = ctypes.c_char_p, ctypes.c_int32, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int32
-  
+
+    if type(XML) is bytes: ptr, size = XML, len(XML)   #   the common case, without BufferPtr()
+    else: ptr, size, owner = BufferPtr(XML)
+    if size > 0x7fffffff: raise ValueError("xmlReadMemory: document larger than 2 GB, use xmlReadFile")
+    if type(options) is not int: options = xmlParseOptions(options)
+
 # wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    pDoc = libXML.xmlReadMemory(XML.encode(), len(XML), URL.encode(), encoding.encode(), options)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
+    try: state = xmlErrors.state    #   xmlCaptureErrors() inline
+    except AttributeError: state = _xmlErrorsSetup()
+    prev, state.errors = state.errors, []
+    try:
+        if not xmlMem.enabled: pDoc = xml2.xmlReadMemory(ptr, size, URL.encode(), encoding.encode(), options)
+        else:
+            with xmlMemDocTag(URL or "<memory>") as t: pDoc = t.doc(xml2.xmlReadMemory(ptr, size, URL.encode(), encoding.encode(), options))
+    finally: errors, state.errors = state.errors, prev
+    if not pDoc: xmlRaiseErrors(errors)
     return pDoc # return xmlDocPtr (xmlDoc*). Add ".contents" in calling program to dereference.
 
+class xmlInputStream():
+# read/close callbacks for xmlReadIO/xmlReaderForIO over a Python file-like object
+#     stream:	anything with readinto() or read(): open files, gzip/lzma/bz2 files, tarfile members, sockets' makefile()...
+#     close:	close the stream when libxml2 is done with it
+#   Keep the object referenced while libxml2 may call it. An exception raised by the stream ends the parse
+#   (the callback returns -1) and is kept in "error".
+    def __init__(self, stream, close: bool = False):
+        self.stream = stream
+        self.error = None
+        readinto = getattr(stream, "readinto", None)
+
+        @xmlInputReadCallback
+        def read(context, buffer, size):
+            try:
+                if readinto != None: return readinto((ctypes.c_char * size).from_address(buffer)) or 0
+                data = stream.read(size)
+                ctypes.memmove(buffer, data, len(data))
+                return len(data)
+            except Exception as e:
+                self.error = e
+                return -1
+
+        @xmlInputCloseCallback
+        def closer(context):
+            if close:
+                try: stream.close()
+                except Exception as e: self.error = self.error or e
+            return 0
+
+        self.read, self.close = read, closer
+
+def xmlReadIO (stream, URL: str = "", encoding: str = "UTF-8", options = 0, close: bool = False) -> xmlDoc:
+# parse an XML document from a Python file-like object, read in chunks as libxml2 needs them (no full copy in memory).
+#     stream:	object with readinto() or read(), e.g. gzip.open(...), lzma.open(...), tarfile extractfile()
+#     URL:	    the base URL to use for the document
+#     encoding:	the document encoding, or NULL
+#     options:	a combination of xmlParserOption, or an xmlParseProfiles name
+#     close:	close the stream after parsing
+#     Returns:	the resulting document tree
+    io = xmlInputStream(stream, close)
+    with xmlCaptureErrors() as errors, xmlMemDocTag(URL or "<stream>") as t:
+        pDoc = t.doc(xml2.xmlReadIO(io.read, io.close, None, URL.encode() if URL else None, encoding.encode(), xmlParseOptions(options)))
+    if io.error != None:
+        if pDoc: xml2.xmlFreeDoc(pDoc)
+        raise io.error
+    if not pDoc: xmlRaiseErrors(errors)
+    return pDoc
+
 def xmlFreeDoc (cur: ctypes.c_void_p) :
 # Free up all the structures used by a document, tree included.
 #     cur:	pointer to the document
 
-# set up prototype
-    libXML.xmlFreeDoc.argtypes = ctypes.c_void_p,
-  
 # wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    libXML.xmlFreeDoc(cur)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
+    xml2.xmlFreeDoc(cur)
     return
 
 def xmlDocGetRootElement (doc: xmlDoc) -> xmlNode:
@@ -253,16 +217,9 @@ def xmlDocGetRootElement (doc: xmlDoc) -> xmlNode:
 #     Returns:	the #xmlNodePtr for the root or NULL
 
     if doc == None: raise xmlNullPtr("XML Document pointer may not be NULL")
-    global libXML
-# Check if DLL into memory. 
-    if libXML == None: raise NullDLL()
-
-# set up prototype
-    libXML.xmlDocGetRootElement.restype = ctypes.POINTER(xmlNode) # correct return type
-    libXML.xmlDocGetRootElement.argtypes = ctypes.c_void_p,
 
 # wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    NodePtr = libXML.xmlDocGetRootElement(doc)
+    NodePtr = xml2.xmlDocGetRootElement(doc)
     return NodePtr   #   return xmlNodePtr (xmlNode*). Add ".contents" in calling program to dereference.
 
 def xmlXPathNewContext (doc: xmlDoc) -> xmlXPathParserContext:
@@ -271,25 +228,13 @@ def xmlXPathNewContext (doc: xmlDoc) -> xmlXPathParserContext:
 #     Returns:	the xmlXPathContext just allocated. The caller will need to free it.
 
     if doc == None: raise xmlNullPtr("XML Document pointer may not be NULL")
-    global libXML
-
-# Check if DLL loaded. 
-    if libXML == None: raise NullDLL()
-
-# set up prototype
-    libXML.xmlXPathNewContext.restype = ctypes.POINTER(xmlXPathParserContext) # correct return type
-    libXML.xmlXPathNewContext.argtypes = ctypes.c_void_p,
-    return libXML.xmlXPathNewContext(doc)
+    return xml2.xmlXPathNewContext(doc)
     
 def xmlXPathFreeContext (ctxt: xmlXPathParserContext) :
 # Free up an xmlXPathContext
 #     ctxt:	the context to free
 
-# set up prototype
-    libXML.xmlXPathFreeContext.argtypes = ctypes.c_void_p,
-    libXML.xmlXPathFreeContext(ctxt)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
+    xml2.xmlXPathFreeContext(ctxt)
     return
 
 def xmlXPathEval (str: str, ctx: xmlXPathParserContext) -> xmlXPathObject:
@@ -300,32 +245,74 @@ def xmlXPathEval (str: str, ctx: xmlXPathParserContext) -> xmlXPathObject:
 
 #   Note: The reason I don't open/close a context ptr for each XPath is you may want to keep it around for multiple queries, or not
     if ctx == None: raise xmlNullPtr("XPath context pointer may not be NULL")
-    global libXML
-# Check if DLL is loaded. 
-    if libXML == None: raise NullDLL()
+    return xml2.xmlXPathEval(str.encode() , ctx)
 
-# set up prototype
-    libXML.xmlXPathEval.restype = ctypes.POINTER(xmlXPathObject) # correct return type
-    libXML.xmlXPathEval.argtypes = ctypes.c_char_p, ctypes.c_void_p,
-    return libXML.xmlXPathEval(str.encode() , ctx)
+def xmlXPathFreeObject (obj: xmlXPathObject) :
+# Free up an xmlXPathObjectPtr object.
+#     obj:	the object to free
 
-def xmlNodeArray(xmlXPathObj: xmlXPathObject) -> array:
-    if not xmlXPathObj: return None # null XPath results
+    xml2.xmlXPathFreeObject(obj)
+    return
+
+def xmlXPathCompile (str: str) -> ctypes.c_void_p:
+# Compile an XPath expression
+#     str:	the XPath expression
+#     Returns:	the xmlXPathCompExprPtr resulting from the compilation or NULL. the caller has to free the object.
+
+    return xml2.xmlXPathCompile(str.encode())
+
+def xmlXPathCompiledEval (comp: ctypes.c_void_p, ctx: xmlXPathParserContext) -> xmlXPathObject:
+# Evaluate the Precompiled XPath expression in the given context.
+#     comp:	the compiled XPath expression
+#     ctx:	the XPath context
+#     Returns:	the xmlXPathObjectPtr resulting from the evaluation or NULL. the caller has to free the object.
+
+    if comp == None: raise xmlNullPtr("Compiled XPath expression may not be NULL")
+    if ctx == None: raise xmlNullPtr("XPath context pointer may not be NULL")
+    return xml2.xmlXPathCompiledEval(comp, ctx)
+
+def xmlXPathFreeCompExpr (comp: ctypes.c_void_p) :
+# Free up the memory allocated by a compiled XPath expression
+#     comp:	an XPATH comp
+
+    xml2.xmlXPathFreeCompExpr(comp)
+    return
+
+def xmlNodePtrs(xmlXPathObj: xmlXPathObject) -> array:
+# View the nodeset of an XPath result as a numpy array of node addresses (uintp), without copying.
+#     xmlXPathObj:	the XPath result
+#     Returns:	array of nodeNr xmlNodePtr values, empty if no nodeset.
+#   Note: the array points into the nodeset, it is only valid while the XPath object hasn't been freed.
+    if not xmlXPathObj: return numpy.empty(0, numpy.uintp) # null XPath results
     x = xmlXPathObj.contents.nodesetval
-    if not x: return None           # no nodeset
-    ns = ctypes.cast(x, ctypes.POINTER(xmlNodeSet)).contents
-    if ns.nodeNr == 0: return None  # empty nodeset
-    n = []
-    xmlNodePtr = ctypes.POINTER(xmlNode)
-    xmlNodePtrPtr = ctypes.POINTER(xmlNodePtr)
-    for i in range(ns.nodeNr):
-        p = ctypes.cast(ns.nodeTab + i*ctypes.sizeof(xmlNodePtr), 
-                            xmlNodePtrPtr)
-        print(p.contents.contents.name)
-        n.append(p.contents.contents)   #   dereference twice since pointer to pointer
-    return n   # return python array of NodeSet 
+    if not x: return numpy.empty(0, numpy.uintp)           # no nodeset
+    ns = xmlNodeSet.from_address(x)
+    if ns.nodeNr == 0: return numpy.empty(0, numpy.uintp)  # empty nodeset
+    return numpy.ctypeslib.as_array(ctypes.cast(ns.nodeTab, ctypes.POINTER(ctypes.c_size_t)), shape=(ns.nodeNr,)).view(numpy.uintp)
+
+def xmlNodeAt(ptrs: array, i: int) -> xmlNode:
+# xmlNode structure for entry "i" of xmlNodePtrs(), created on request only
+    return xmlNode.from_address(int(ptrs[i]))
+
+def xmlNodeString(node) -> str:
+# string value of a node (XPath string())
+#     node:	xmlNodePtr or address
+    p = xml2.xmlXPathCastNodeToString(node)
+    if not p: return None
+    s = ctypes.string_at(p).decode('utf-8')
+    xml2.xmlFree(p)
+    return s
+
+def xmlNodeArray(xmlXPathObj: xmlXPathObject) -> array:
+    ptrs = xmlNodePtrs(xmlXPathObj)
+    if len(ptrs) == 0: return None  # null XPath results, no nodeset or empty nodeset
+    return [xmlNode.from_address(p) for p in ptrs.tolist()]   # return python array of NodeSet 
 
 def test():
+    from PyQt5.QtWidgets import (
+        QApplication, 
+        QFileDialog
+    )
     app = QApplication(sys.argv)
     FileObj = QFileDialog.getOpenFileName(None, "Select XML file to load", None, "XML (*.xml)")
 
@@ -364,9 +351,10 @@ def test():
     NodeSet = xmlNodeArray(XPathObj)
     for n in NodeSet:
         print(n.name)
+    xmlXPathFreeObject(XPathObj)
     xmlXPathFreeContext(ctxt)
     if pDoc : xmlFreeDoc(pDoc)
 
     return
 
-test()
\ No newline at end of file
+if __name__ == "__main__": test()
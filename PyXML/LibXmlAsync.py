@@ -0,0 +1,149 @@
+# asyncio front end for the libxml2 wrappers.
+'''
+Parsing and XPath run in a bounded thread pool, libxml2 releases the GIL (ctypes) while it works, so a large
+parse doesn't stall the event loop or other coroutines.
+
+    async def main():
+        doc = await parse_file("orders.xml")
+        total = await doc.xpath("sum(//order/@amount)")
+        async for id in elements("export.xml", "record", extract=lambda r: r.XPathEval("string(@id)").GetString(), expand=True):
+            ...
+
+Backpressure: at most "max_pending" calls are queued or running in the pool, further callers wait in the event
+loop. elements() reads ahead at most "queue" items, the reader thread blocks until the consumer catches up.
+'''
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from LibXmlObj import *
+
+class xmlAsync():     #   executor and backpressure settings
+    '''
+    workers:        threads parsing/querying at once (a running elements() stream holds one)
+    max_pending:    calls queued or running in the pool, None for 2 * workers
+    queue:          default read-ahead of elements()
+    '''
+    def __init__(self, workers: int = 4, max_pending: int = None, queue: int = 64):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="xmlAsync")
+        self.max_pending = max_pending or 2 * workers
+        self.queue = queue
+        self.loop = self.semaphore = None
+
+    @property
+    def slots(self) -> asyncio.Semaphore:   #   pending-call limit, one per event loop
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop: self.loop, self.semaphore = loop, asyncio.Semaphore(self.max_pending)
+        return self.semaphore
+
+    def close(self):    #   wait for running calls and stop the threads
+        self.executor.shutdown(wait=True)
+
+    async def run(self, func, *args):   #   func(*args) in the pool, waiting for a slot first
+        async with self.slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def parse_file(self, filename: str, encoding: str = "UTF-8", options = 0):
+        return xmlAsyncDoc(await self.run(lambda: xml(xmlReadFile(filename, encoding, options))), self)
+
+    async def parse_bytes(self, data, URL: str = "", encoding: str = "UTF-8", options = 0):
+    #   data: str or any buffer-protocol object, not copied (keep it unchanged until the call returns)
+        return xmlAsyncDoc(await self.run(lambda: xml(xmlReadMemory(data, URL, encoding, options))), self)
+
+    async def elements(self, filename: str, tag: str = None, extract = None, expand: bool = False,
+                       encoding: str = "UTF-8", options = 0, queue: int = None):
+        '''
+        Async iterator over xmlReader.elements(). The reader runs in a pool thread, extract(reader) is called
+        there for each element (default: the element name) and its result is what the iterator yields.
+        The reader is positioned on the element only during extract(), so copy what's needed.
+        '''
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        room = threading.Semaphore(queue or self.queue)     #   read-ahead still allowed
+        stop = threading.Event()
+        done = object()
+        extract = extract or (lambda r: r.name)
+
+        def send(item):
+            try: loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError: stop.set()     #   event loop closed
+
+        def produce():
+            try:
+                with xmlReader(filename, encoding, options) as r:
+                    for e in r.elements(tag, expand):
+                        value = extract(e)
+                        while not room.acquire(timeout=0.1):    #   backpressure, checking for a consumer that left
+                            if stop.is_set(): return
+                        if stop.is_set(): return
+                        send((value, None))
+            except Exception as err:
+                send((None, err))
+            finally:
+                send((done, None))
+
+        async with self.slots:
+            future = loop.run_in_executor(self.executor, produce)
+            try:
+                while True:
+                    value, err = await items.get()
+                    if err != None: raise err
+                    if value is done: break
+                    room.release()
+                    yield value
+                await future
+            finally:
+                stop.set()
+
+class xmlAsyncDoc():     #   parsed document, queried in the pool
+    '''
+    The document is read-only while queries run: each pool thread evaluates with its own XPath context.
+    "xml" is the underlying document for synchronous use.
+    '''
+    def __init__(self, doc: xml, front: xmlAsync):
+        self.xml = doc
+        self.front = front
+
+    async def xpath(self, exp: str):    #   plain Python value, see xmlXPathResult.GetValue(); None for invalid expressions
+        def eval():
+            r = self.xml.XPathEval(exp)
+            if not r: return None
+            with r: return r.GetValue()
+        return await self.front.run(eval)
+
+    async def nodes(self, exp: str) -> list:    #   node handles, see xml.Nodes()
+        return await self.front.run(self.xml.Nodes, exp)
+
+    async def run(self, func, *args):   #   func(xml, *args) in the pool, e.g. ExtractColumns
+        return await self.front.run(func, self.xml, *args)
+
+xmlAsyncDefault: xmlAsync = None     #   created on first use by the module functions
+
+def xmlAsyncSetup(workers: int = 4, max_pending: int = None, queue: int = 64) -> xmlAsync:
+# Replace the default front end used by parse_file(), parse_bytes() and elements().
+    global xmlAsyncDefault
+    if xmlAsyncDefault != None: xmlAsyncDefault.close()
+    xmlAsyncDefault = xmlAsync(workers, max_pending, queue)
+    return xmlAsyncDefault
+
+def _default() -> xmlAsync:
+    if xmlAsyncDefault == None: xmlAsyncSetup()
+    return xmlAsyncDefault
+
+async def parse_file(filename: str, encoding: str = "UTF-8", options = 0) -> xmlAsyncDoc:
+    return await _default().parse_file(filename, encoding, options)
+
+async def parse_bytes(data, URL: str = "", encoding: str = "UTF-8", options = 0) -> xmlAsyncDoc:
+    return await _default().parse_bytes(data, URL, encoding, options)
+
+def elements(filename: str, tag: str = None, extract = None, expand: bool = False, encoding: str = "UTF-8", options = 0, queue: int = None):
+    return _default().elements(filename, tag, extract, expand, encoding, options, queue)
+
+def test():
+    async def main():
+        doc = await parse_bytes("<notice><to>Tove</to><from>Jani</from><heading>Reminder</heading></notice>")
+        print(await doc.xpath("string(/notice/heading)"), await doc.xpath("count(//*)"))
+        print(await asyncio.gather(*(doc.xpath(f"name(/notice/*[{i}])") for i in range(1, 4))))
+    asyncio.run(main())
+
+if __name__ == "__main__": test()
@@ -0,0 +1,641 @@
+# Micro-benchmarks for the libxml2 wrappers.
+'''
+Run from the PyXML directory:   python LibXmlBench.py
+Each bench_* function prints its own results and can also be called on its own.
+'''
+
+import ctypes
+import mmap
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+import xml.etree.ElementTree as ET
+import LibXmlBind
+from LibXmlObj import *
+
+NOTICE = """
+ <notice>
+  <to>Tove</to>
+  <from>Jani</from>
+  <heading>Reminder</heading>
+  <body>Don't forget me this weekend!</body>
+</notice>   """
+
+def _legacy_xmlDocGetRootElement(doc):
+#   what every wrapper used to do before LibXmlBind: load check + prototype set-up on each call
+    if doc == None: raise xmlNullPtr("XML Document pointer may not be NULL")
+    if LibXmlBind.libXML == None: raise NullDLL()
+    LibXmlBind.libXML.xmlDocGetRootElement.restype = ctypes.POINTER(xmlNode)
+    LibXmlBind.libXML.xmlDocGetRootElement.argtypes = ctypes.c_void_p,
+    return LibXmlBind.libXML.xmlDocGetRootElement(doc)
+
+def _legacy_xmlXPathEval(str, ctx):
+    if ctx == None: raise xmlNullPtr("XPath context pointer may not be NULL")
+    if LibXmlBind.libXML == None: raise NullDLL()
+    LibXmlBind.libXML.xmlXPathEval.restype = ctypes.POINTER(xmlXPathObject)
+    LibXmlBind.libXML.xmlXPathEval.argtypes = ctypes.c_char_p, ctypes.c_void_p,
+    return LibXmlBind.libXML.xmlXPathEval(str.encode() , ctx)
+
+def _legacy_xmlReadMemory(XML: bytes):
+#   extra xmlGetLastError round trip after every call, raising on any earlier (sticky) error
+    pDoc = xml2.xmlReadMemory(XML, len(XML), b"", b"UTF-8", 0)
+    Err = xml2.xmlGetLastError()
+    if Err: raise LibErr(Err)
+    return pDoc
+
+def _legacy_xmlNodeArray(xmlXPathObj):
+#   cast + double dereference per node (the per-node print() is left out)
+    x = xmlXPathObj.contents.nodesetval
+    ns = ctypes.cast(x, ctypes.POINTER(xmlNodeSet)).contents
+    n = []
+    xmlNodePtr = ctypes.POINTER(xmlNode)
+    xmlNodePtrPtr = ctypes.POINTER(xmlNodePtr)
+    for i in range(ns.nodeNr):
+        p = ctypes.cast(ns.nodeTab + i*ctypes.sizeof(xmlNodePtr), xmlNodePtrPtr)
+        n.append(p.contents.contents)
+    return n
+
+def _rss() -> int:
+#   current resident set size in bytes (peak RSS where /proc isn't available)
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError: pass
+    try: import resource    #   Unix only
+    except ImportError: return 0    #   no RSS figures, e.g. on Windows
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _legacy_walk(node: xmlNode, names: list):
+#   following children/next by hand with ctypes.cast, as callers of xmlNodeArray had to
+    p = node.children
+    while p:
+        n = ctypes.cast(p, ctypes.POINTER(xmlNode)).contents
+        if n.type == XML_NODE_TYPE.ELEMENT:
+            names.append(n.name)
+            _legacy_walk(n, names)
+        p = n.next
+    return names
+
+def _heap() -> int:
+#   bytes currently allocated by malloc, RSS where that isn't available. Unlike RSS, it goes down again on free.
+    h = HeapUsed()
+    if h == None: return _rss()
+    return h
+
+def _best(funcs: dict, n: int, batch: int = 200) -> dict:
+#   time of n calls of each function, from its fastest batch. The functions take turns batch by batch, so
+#   they see the same heap and scheduling conditions: small per-call differences are lost in that noise otherwise.
+    best = dict.fromkeys(funcs, float("inf"))
+    for i in range(max(n // batch, 1)):
+        for name, func in funcs.items(): best[name] = min(best[name], timeit.timeit(func, number=batch))
+    return {name: t * n / batch for name, t in best.items()}
+
+def _report(title: str, results: dict, n: int):
+    print(title)
+    base = None
+    for name, t in results.items():
+        us = t / n * 1e6
+        if base == None: base = us
+        print(f"    {name:<32} {us:8.3f} us/call   x{base/us:5.2f}")
+
+def bench_prototypes(n: int = 200000):
+# per-call overhead of the wrapper layer, before (prototype set-up on each call) and after (pre-bound)
+    pDoc = xmlReadMemory(NOTICE, "", "UTF-8", 0)
+    ctxt = xmlXPathNewContext(pDoc)
+    results = {
+        "legacy xmlDocGetRootElement": lambda: _legacy_xmlDocGetRootElement(pDoc),
+        "xmlDocGetRootElement":        lambda: xmlDocGetRootElement(pDoc),
+        "xml2.xmlDocGetRootElement":   lambda: xml2.xmlDocGetRootElement(pDoc),
+    }
+    _report(f"prototype binding, {n} calls", _best(results, n), n)
+
+    m = n // 4
+    results = {
+        "legacy xmlXPathEval":  lambda: xmlXPathFreeObject(_legacy_xmlXPathEval("count(/*/*)", ctxt)),
+        "xmlXPathEval":         lambda: xmlXPathFreeObject(xmlXPathEval("count(/*/*)", ctxt)),
+    }
+    _report(f"XPath evaluation, {m} calls", _best(results, m), m)
+    xmlXPathFreeContext(ctxt)
+    xmlFreeDoc(pDoc)
+
+    small = NOTICE.encode()
+    results = {
+        "legacy xmlReadMemory": lambda: xmlFreeDoc(_legacy_xmlReadMemory(small)),
+        "xmlReadMemory":        lambda: xmlFreeDoc(xmlReadMemory(small, "", "UTF-8", 0)),
+    }
+    _report(f"parse + free of a small document, {m} calls", _best(results, m), m)
+
+def bench_xpath_cache(n: int = 50000):
+# re-parsing the expression on every call vs the compiled expression cache on the xml class
+    exp = "/notice/*[name()='heading' or name()='body'][last()]"
+    x = xml(xmlReadMemory(NOTICE, "", "UTF-8", 0))
+    ctxt = x.context()
+    xml.XPathCache.clear()
+    results = {
+        "xmlXPathEval":         lambda: xmlXPathFreeObject(xmlXPathEval(exp, ctxt)),
+        "  + xmlXPathResult":   lambda: xmlXPathResult(xmlXPathEval(exp, ctxt), x).free(),
+        "xml.XPathEval":        lambda: x.XPathEval(exp).free(),
+    }
+    _report(f"compiled XPath cache, {n} calls", _best(results, n), n)
+    print(f"    {xml.XPathCache.stats()}")
+
+def bench_nodeset(rows: int = 100000, n: int = 10):
+# nodeset extraction: per-node casts vs struct per node vs zero-copy pointer view
+    s = "<table>" + "<row/>" * rows + "</table>"
+    x = xml(xmlReadMemory(s, "", "UTF-8", 0))
+    obj = x.XPathEval("/table/row")
+    results = {
+        "legacy xmlNodeArray":  timeit.timeit(lambda: _legacy_xmlNodeArray(obj), number=n),
+        "xmlNodeArray":         timeit.timeit(lambda: xmlNodeArray(obj), number=n),
+        "xmlNodePtrs":          timeit.timeit(lambda: xmlNodePtrs(obj), number=n),
+    }
+    _report(f"nodeset of {rows} nodes, {n} extractions", results, n)
+    obj.free()
+
+def bench_soak(n: int = 1000000, step: int = 100000):
+# RSS over n queries, results freed by "with" and by dropping the last reference
+    x = xml(xmlReadMemory(NOTICE, "", "UTF-8", 0))
+    print(f"XPath result soak, {n} queries")
+    start = _rss()
+    for i in range(1, n + 1):
+        if i & 1:
+            with x.XPathEval("/notice/*") as r: r.NodePtrs()
+        else:
+            x.XPathEval("string(/notice/to)")
+        if i % step == 0:
+            rss = _rss()
+            print(f"    {i:>8} queries   RSS {rss / 2**20:8.2f} MB   (+{(rss - start) / 2**10:.0f} kB)")
+
+def bench_reader(rows: int = 1000000):
+# memory: whole DOM (xmlReadFile) vs streaming xmlReader with expanded records
+    with tempfile.NamedTemporaryFile("w", suffix=".xml", delete=False) as f:
+        f.write("<export>\n")
+        for i in range(rows): f.write(f'<record id="{i}"><name>item {i}</name><value>{i * 0.5}</value></record>\n')
+        f.write("</export>\n")
+    size = os.path.getsize(f.name)
+    print(f"streaming reader, {rows} records, {size / 2**20:.1f} MB file")
+    try:
+        start = _rss()
+        total = 0.0
+        with xmlReader(f.name) as r:
+            for e in r.elements("record", expand=True):
+                with e.XPathEval("number(value)") as v: total += v.contents.floatval
+        print(f"    xmlReader      sum={total:.1f}   RSS +{(_rss() - start) / 2**20:8.2f} MB")
+        start = _rss()
+        x = xml(xmlReadFile(f.name, "UTF-8", 0))
+        with x.XPathEval("sum(/export/record/value)") as v: total = v.contents.floatval
+        print(f"    xmlReadFile    sum={total:.1f}   RSS +{(_rss() - start) / 2**20:8.2f} MB")
+        del x
+    finally:
+        os.remove(f.name)
+
+def bench_read_memory(mb: int = 100, n: int = 3):
+# xmlReadMemory on a str (encoded copy) vs bytes vs mmap of the file (no copy)
+    text = "x" * 1000
+    with tempfile.NamedTemporaryFile("w", suffix=".xml", delete=False, encoding="utf-8") as f:
+        f.write("<data>\n")
+        for i in range(mb * 2**20 // (len(text) + 20)): f.write(f"<r n='{i}'>{text}</r>\n")
+        f.write("</data>\n")
+    try:
+        with open(f.name, encoding="utf-8") as fs: s = fs.read()
+        with open(f.name, "rb") as fb: b = fb.read()
+        with open(f.name, "rb") as fm:
+            m = mmap.mmap(fm.fileno(), 0, access=mmap.ACCESS_READ)
+            results = {}
+            for name, data in (("str", s), ("bytes", b), ("mmap", m)):
+                results[name] = timeit.timeit(lambda: xmlFreeDoc(xmlReadMemory(data, "", "UTF-8", XML_PARSE.HUGE)), number=n)
+            m.close()
+        _report(f"xmlReadMemory of {len(b) / 2**20:.0f} MB, {n} parses", results, n)
+    finally:
+        os.remove(f.name)
+
+def bench_batch(docs: int = 20000, workers: int = None):
+# serial xmlReadMemory vs xmlParseBatch on a thread pool
+    workers = workers or os.cpu_count()
+    sources = [("<doc n='%d'>" % i + "<item>text</item>" * 50 + "</doc>").encode() for i in range(docs)]
+    results = {
+        "serial xmlReadMemory":         timeit.timeit(lambda: [xml(xmlReadMemory(b, "", "UTF-8", 0)) for b in sources], number=1),
+        "xmlParseBatch, 1 thread":      timeit.timeit(lambda: xmlParseBatch(sources, workers=1), number=1),
+        f"xmlParseBatch, {workers} threads": timeit.timeit(lambda: xmlParseBatch(sources, workers=workers), number=1),
+    }
+    _report(f"batch parse of {docs} documents", results, docs)
+
+def bench_extract_pool(docs: int = 20000, processes: int = None):
+# parse + extract in this process vs xmlExtractPool worker processes
+    processes = processes or os.cpu_count()
+    sources = [("<doc n='%d'>" % i + "".join(f"<item v='{j}'>text {j}</item>" for j in range(50)) + "</doc>").encode() for i in range(docs)]
+    xpaths = ["number(/doc/@n)", "sum(//item/@v)", "//item[@v > 45]"]
+    results = {
+        "serial xmlExtract":    timeit.timeit(lambda: xmlExtract(sources, xpaths, "UTF-8", 0), number=1),
+        f"xmlExtractPool, {processes} processes": timeit.timeit(lambda: xmlExtractPool(sources, xpaths, processes), number=1),
+    }
+    _report(f"parse and extract of {docs} documents", results, docs)
+
+def bench_columns(rows: int = 200000):
+# ExtractColumns throughput on a generated table
+    s = "<table>" + "".join(f'<row id="{i}" price="{i * 0.25}"><name>item {i}</name></row>' for i in range(rows)) + "</table>"
+    x = xml(xmlReadMemory(s, "", "UTF-8", XML_PARSE.HUGE))
+    columns = {"id": ("@id", "i8"), "price": ("@price", float), "name": "name"}
+    t = timeit.timeit(lambda: x.ExtractColumns("/table/row", columns), number=1)
+    print(f"ExtractColumns, {rows} rows x {len(columns)} columns")
+    print(f"    {t:.2f} s   {rows / t:,.0f} rows/s   {t / (rows * len(columns)) * 1e6:.3f} us/cell")
+
+def bench_node_proxy(rows: int = 100000):
+# memory per handle and tree walk speed: xmlNode structures vs xmlNodeProxy
+    s = "<table>" + "".join(f'<row id="{i}"><name>item {i}</name></row>' for i in range(rows)) + "</table>"
+    x = xml(xmlReadMemory(s, "", "UTF-8", XML_PARSE.HUGE))
+    r = x.XPathEval("//row")
+    print(f"node handles, {rows} nodes")
+    for name, make in (("xmlNodeArray", lambda: xmlNodeArray(r)), ("xml.Nodes", lambda: x.Nodes("//row"))):
+        tracemalloc.start()
+        nodes = make()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"    {name:<32} {size / len(nodes):8.1f} bytes/node")
+        del nodes
+    r.free()
+    root = x.Root()
+    pRoot = xmlDocGetRootElement(x.pDoc).contents
+    walks = {
+        "ctypes.cast walk":         lambda: _legacy_walk(pRoot, []),
+        "descendants()":            lambda: [n.name for n in root.descendants(XML_NODE_TYPE.ELEMENT)],
+        "XPath //* + xmlNodeArray": lambda: [n.name for n in xmlNodeArray(x.XPathEval("//*"))],
+    }
+    rounds = 5     #   whole walks, taking turns: the fastest of each
+    results = {name: t / rounds for name, t in _best(walks, rounds, batch=1).items()}
+    _report(f"element walk, {2 * rows} elements", results, 2 * rows)
+
+def bench_shared_dict(docs: int = 5000):
+# heap used by a corpus of same-schema documents held in memory: per-document dictionaries vs one shared xmlDict
+    fields = [f"field_{c}_{k}" for c in "abcdefghij" for k in range(10)]
+    corpus = [("<record>\n" + "".join(f"  <{f} unit='u'>{i}</{f}>\n" for f in fields) + "</record>\n").encode() for i in range(docs)]
+    print(f"corpus of {docs} documents, {len(fields)} element names each")
+    base = None
+    for name, parse in (("xmlReadMemory, default",     lambda b: xml(xmlReadMemory(b, "", "UTF-8", 0))),
+                        ("xmlReadMemory, 'lean'",      lambda b: xml(xmlReadMemory(b, "", "UTF-8", "lean"))),
+                        ("xmlDictParser, 'lean'",      xmlDictParser(options="lean").parse)):
+        start = _heap()
+        held = [parse(b) for b in corpus]
+        used = _heap() - start
+        if base == None: base = used
+        print(f"    {name:<32} {used / 2**20:8.2f} MB   {used / docs / 1024:6.2f} kB/doc   saved {(base - used) / 2**20:6.2f} MB")
+        del held
+
+def bench_doc_cache(files: int = 20, n: int = 2000):
+# xmlReadFile on every request vs xmlDocCache
+    paths = []
+    for i in range(files):
+        with tempfile.NamedTemporaryFile("w", suffix=".xml", delete=False) as f:
+            f.write("<config>" + "".join(f'<key name="k{j}" value="{i * j}"/>' for j in range(500)) + "</config>")
+        paths.append(f.name)
+    try:
+        cache = xmlDocCache()
+        lookup = lambda x: x.XPathEval("string(/config/key[@name='k250']/@value)").GetString()
+        results = {
+            "xmlReadFile":  timeit.timeit(lambda: [lookup(xml(xmlReadFile(p, "UTF-8", 0))) for p in paths], number=n // files),
+            "xmlDocCache":  timeit.timeit(lambda: [lookup(cache.get(p)) for p in paths], number=n // files),
+        }
+        _report(f"config lookups, {files} files, {n} requests", results, n)
+        print(f"    {cache.stats()}")
+    finally:
+        for p in paths: os.remove(p)
+
+def bench_serialize(rows: int = 100000):
+# serialization of a loaded document, and generating a document, vs xml.etree.ElementTree.tostring
+    s = "<table>" + "".join(f'<row id="{i}"><name>item {i}</name><value>{i * 0.5}</value></row>' for i in range(rows)) + "</table>"
+    x = xml(xmlReadMemory(s, "", "UTF-8", XML_PARSE.HUGE))
+    tree = ET.fromstring(s)
+    results = {
+        "ET.tostring":  timeit.timeit(lambda: ET.tostring(tree, encoding="utf-8"), number=1),
+        "xml.ToBytes":  timeit.timeit(lambda: x.ToBytes(), number=1),
+    }
+    _report(f"serialize {rows} rows", results, rows)
+
+    def build_et():
+        root = ET.Element("table")
+        for i in range(rows):
+            r = ET.SubElement(root, "row", id=str(i))
+            ET.SubElement(r, "name").text = f"item {i}"
+            ET.SubElement(r, "value").text = str(i * 0.5)
+        return ET.tostring(root, encoding="utf-8")
+
+    def write():
+        out = []
+        with xmlWriter() as w:
+            w.StartDocument()
+            w.StartElement("table")
+            for i in range(rows):
+                w.StartElement("row", id=i)
+                w.WriteElement("name", f"item {i}")
+                w.WriteElement("value", str(i * 0.5))
+                w.EndElement()
+                if i % 10000 == 0: out.append(w.drain())
+            w.EndDocument()
+            out.append(w.drain())
+        return b"".join(out)
+
+    results = {
+        "ET build + tostring":  timeit.timeit(build_et, number=1),
+        "xmlWriter":            timeit.timeit(write, number=1),
+    }
+    _report(f"generate {rows} rows", results, rows)
+
+def bench_edit(keys: int = 10000, n: int = 20):
+# change one attribute: serialize + patch + reparse vs SetProp in place
+    s = "<config>" + "".join(f'<key name="k{j}" value="{j}"/>' for j in range(keys)) + "</config>"
+    x = xml(xmlReadMemory(s, "", "UTF-8", 0))
+
+    def reparse():
+        nonlocal x
+        text = x.ToBytes().replace(b'name="k500" value="500"', b'name="k500" value="patched"')
+        x = xml(xmlReadMemory(text, "", "UTF-8", 0))
+
+    results = {"serialize + reparse": timeit.timeit(reparse, number=n)}
+    node = x.Nodes("/config/key[@name='k500']")[0]
+    results["xml.SetProp"] = timeit.timeit(lambda: x.SetProp(node, "value", "patched"), number=n)
+    _report(f"single attribute edit, {keys} keys", results, n)
+
+XSD = """<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+ <xs:element name="root"><xs:complexType><xs:sequence>
+  <xs:element name="rec" maxOccurs="unbounded"><xs:complexType><xs:sequence><xs:element name="v" type="xs:integer"/></xs:sequence>
+   <xs:attribute name="id" type="xs:integer" use="required"/></xs:complexType></xs:element>
+ </xs:sequence></xs:complexType></xs:element>
+</xs:schema>"""
+
+def bench_schema(n: int = 2000, rows: int = 200000):
+# validate small documents: parse the XSD every time vs the cached compiled schema
+    fd, xsd = tempfile.mkstemp(".xsd")
+    os.write(fd, XSD.encode()); os.close(fd)
+    x = xml(xmlReadMemory("<root>" + "".join(f'<rec id="{j}"><v>{j}</v></rec>' for j in range(10)) + "</root>", "", "UTF-8", 0))
+    results = {"xmlSchema() per document": timeit.timeit(lambda: xmlSchema(xsd).Validate(x), number=n),
+               "xmlLoadSchema (cached)": timeit.timeit(lambda: xmlLoadSchema(xsd).Validate(x), number=n)}
+    _report("XSD validation, 10 records", results, n)
+
+# large file: DOM + Validate vs streaming ValidateFile
+    fd, path = tempfile.mkstemp(".xml")
+    with os.fdopen(fd, "w") as f:
+        f.write("<root>")
+        for j in range(rows): f.write(f'<rec id="{j}"><v>{j}</v></rec>')
+        f.write("</root>")
+    schema = xmlLoadSchema(xsd)
+    h = _heap()
+    t = time.perf_counter()
+    d = xml(xmlReadFile(path, "UTF-8", 0))
+    schema.Validate(d)
+    t = time.perf_counter() - t
+    print(f"    DOM + Validate       {t:8.3f} s   DOM {(_heap() - h) >> 20} MB")
+    del d
+    t = timeit.timeit(lambda: schema.ValidateFile(path), number=1)
+    print(f"    ValidateFile         {t:8.3f} s   streaming, no DOM")
+    os.remove(path); os.remove(xsd)
+
+def bench_index(rows: int = 100000, n: int = 2000):
+# repeated key lookups: XPath scan vs attribute index vs DTD ID table
+    s = '<!DOCTYPE r [<!ATTLIST item uid ID #IMPLIED>]><r>' + "".join(f'<item uid="u{j}" key="k{j}"/>' for j in range(rows)) + "</r>"
+    x = xml(xmlReadMemory(s, "", "UTF-8", 0))
+    keys = [f"k{j * 7919 % rows}" for j in range(n)]
+    it = iter(keys * 2)
+    results = {"XPath //item[@key=...]": timeit.timeit(lambda: x.Nodes(f"//item[@key='{next(it)}']"), number=n // 20)}
+    results = {k: t * 20 for k, t in results.items()}   #   scan is slow, time 1/20 of the lookups
+    x.Index("key")
+    t = time.perf_counter(); x.Find("key", "k0"); build = time.perf_counter() - t
+    it = iter(keys)
+    results["Index + Find"] = timeit.timeit(lambda: x.Find("key", next(it)), number=n)
+    it = iter(keys)
+    results["Find via xmlGetID"] = timeit.timeit(lambda: x.Find("uid", "u" + next(it)[1:]), number=n)
+    _report(f"attribute lookup, {rows} elements", results, n)
+    print(f"    index build {build * 1e3:.1f} ms")
+
+def bench_threads(rows: int = 20000, n: int = 200, workers: int = 4):
+# one shared document queried from a thread pool: one context behind a lock vs per-thread contexts
+    from concurrent.futures import ThreadPoolExecutor
+    x = xml(xmlReadMemory("<r>" + "".join(f'<i k="{j}"><v>{j}</v></i>' for j in range(rows)) + "</r>", "", "UTF-8", 0))
+    exps = [f"sum(//i[@k > {j}]/v)" for j in range(16)]
+    ctxt, lock = xmlXPathNewContext(x.pDoc), threading.Lock()
+
+    def locked(j):
+        with lock:
+            obj = xmlXPathEval(exps[j % 16], ctxt)
+            v = obj.contents.floatval
+            xmlXPathFreeObject(obj)
+        return v
+
+    def pooled(j):
+        return x.XPathEval(exps[j % 16]).GetValue()
+
+    results = {}
+    for name, f in (("shared context + lock", locked), ("xml.XPathEval per thread", pooled)):
+        with ThreadPoolExecutor(workers) as pool:
+            results[name] = timeit.timeit(lambda: list(pool.map(f, range(n))), number=1)
+    xmlXPathFreeContext(ctxt)
+    _report(f"XPath from {workers} threads, {rows} rows ({os.cpu_count()} CPUs)", results, n)
+
+def bench_mem_instrument(rows: int = 100000):
+# cost of xmlMemInstrument(): parse + XPath in a fresh interpreter with and without the counting allocator
+    import subprocess, sys
+    code = f"""
+import sys, time, LibXmlBind
+if sys.argv[1] == "on": LibXmlBind.xmlMemInstrument()
+from LibXmlObj import *
+s = "<r>" + "".join(f'<i k="{{j}}">{{j}}</i>' for j in range({rows})) + "</r>"
+t = time.perf_counter()
+x = xml(xmlReadMemory(s, "", "UTF-8", 0))
+n = len(x.Nodes("//i[@k mod 2 = 0]"))
+print(time.perf_counter() - t, xmlMemSnapshot()["peak_bytes"])
+"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"xmlMemInstrument, parse + XPath of {rows} elements")
+    for mode in ("off", "on"):
+        out = subprocess.run([sys.executable, "-c", code, mode], cwd=here, capture_output=True, text=True, check=True).stdout.split()
+        print(f"    instrumentation {mode:<4} {float(out[0]):8.3f} s   peak {int(out[1]) >> 20} MB")
+
+def bench_async(rows: int = 300000):
+# event loop responsiveness while a large file is parsed: blocking xmlReadFile vs LibXmlAsync.parse_file
+    import asyncio
+    import LibXmlAsync
+    fd, path = tempfile.mkstemp(".xml")
+    with os.fdopen(fd, "w") as f:
+        f.write("<r>" + "".join(f'<rec id="{j}"><v>{j}</v></rec>' for j in range(rows)) + "</r>")
+
+    async def measure(parse):
+        gaps = [0]
+        async def beat():   #   a 10 ms ticker standing in for unrelated coroutines
+            t = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                n = time.perf_counter()
+                gaps.append(n - t)
+                t = n
+        ticker = asyncio.create_task(beat())
+        await asyncio.sleep(0.02)
+        t = time.perf_counter()
+        await parse()
+        t = time.perf_counter() - t
+        await asyncio.sleep(0.02)   #   let the ticker record a stall
+        ticker.cancel()
+        return t, max(gaps)
+
+    async def blocking(): xml(xmlReadFile(path, "UTF-8", 0))
+    async def pooled(): await LibXmlAsync.parse_file(path)
+
+    print(f"event loop stall while parsing {rows} records")
+    for name, parse in (("xmlReadFile in the loop", blocking), ("await parse_file", pooled)):
+        t, gap = asyncio.run(measure(parse))
+        print(f"    {name:<26} {t:8.3f} s   longest tick {gap * 1e3:7.1f} ms")
+    os.remove(path)
+
+def bench_diff(rows: int = 100000, changes: int = 10):
+# new version of a document with a few changed records: what to reprocess, all records vs Diff()
+    doc = lambda changed: "<orders>" + "".join(f'<order id="{j}"><v>{"x" if j in changed else ""}{j}</v></order>' for j in range(rows)) + "</orders>"
+    old = xml(xmlReadMemory(doc(()), "", "UTF-8", 0))
+    new = xml(xmlReadMemory(doc({j * rows // changes for j in range(changes)}), "", "UTF-8", 0))
+    t = time.perf_counter()
+    old.Fingerprint(); new.Fingerprint()
+    hashing = time.perf_counter() - t
+    t = time.perf_counter()
+    d = old.Diff(new, key="id", depth=1)
+    t = time.perf_counter() - t
+    print(f"subtree diff, {rows} records, {changes} changed")
+    print(f"    hashing both documents   {hashing:8.3f} s   ({rows / hashing:,.0f} records/s per document pair)")
+    print(f"    Diff(key='id', depth=1)  {t:8.3f} s   {len(d)} subtrees to reprocess instead of {rows}")
+
+def bench_read_io(rows: int = 500000):
+# gzip-compressed input: decompress then xmlReadMemory vs xmlReadIO over gzip.open, peak RSS per fresh process
+    import gzip, subprocess, sys
+    try: import resource    #   Unix only, the measuring processes use it
+    except ImportError:
+        print("gzip input: skipped, peak RSS needs the resource module (Unix)")
+        return
+    fd, path = tempfile.mkstemp(".xml.gz")
+    with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+        f.write(b"<r>")
+        for j in range(0, rows, 1000):
+            f.write("".join(f'<rec id="{i}"><v>{i}</v></rec>' for i in range(j, min(j + 1000, rows))).encode())
+        f.write(b"</r>")
+    size = os.path.getsize(path)
+    modes = {
+        "gzip.decompress + xmlReadMemory": "x = xml(xmlReadMemory(gzip.open(path).read(), '', 'UTF-8', 0))",
+        "xmlReadIO(gzip.open)":            "x = xml(xmlReadIO(gzip.open(path)))",
+        "xmlReadFile (libxml2 zlib)":      "x = xml(xmlReadFile(path, 'UTF-8', 0))",
+        "xmlReader(gzip.open), no DOM":    "n = sum(1 for e in xmlReader(gzip.open(path)).elements('rec'))",
+    }
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"gzip input, {rows} records, {size >> 20} MB compressed")
+    for name, stmt in modes.items():
+        code = f"""
+import gzip, resource, sys, time
+from LibXmlObj import *
+path = sys.argv[1]
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t = time.perf_counter()
+{stmt}
+print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base)
+"""
+        out = subprocess.run([sys.executable, "-c", code, path], cwd=here, capture_output=True, text=True, check=True).stdout.split()
+        t, peak = float(out[0]), int(out[1]) << 10  #   ru_maxrss is in KB on Linux
+        print(f"    {name:<34} {t:8.3f} s   {rows / t:12,.0f} records/s   peak +{peak >> 20} MB")
+    os.remove(path)
+
+def bench_binding(rows: int = 100000):
+# XML records to a C struct array: node handles + Python conversion vs a compiled xmlBinding
+    x = xml(xmlReadMemory("<r>" + "".join(f'<order id="{j}"><price>{j * 1.5}</price><sku>S{j}</sku></order>' for j in range(rows)) + "</r>", "", "UTF-8", 0))
+    b = xmlBinding("//order", [("id", "@id", "int"), ("price", "price", "double"), ("sku", "sku", "char[16]")])
+
+    def handles():
+        recs = []
+        for n in x.Nodes("//order"):
+            c = {e.name: e.content for e in n.children(XML_NODE_TYPE.ELEMENT)}
+            recs.append((int(n.GetProp("id")), float(c["price"]), c["sku"].encode()))
+        return numpy.array(recs, b.dtype)
+
+    results = {"Nodes + Python records": timeit.timeit(handles, number=1),
+               "xmlBinding.Extract": timeit.timeit(lambda: b.Extract(x), number=1)}
+    _report(f"struct array from {rows} records (per record)", results, rows)
+
+XSL = """<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+ <xsl:template match="/notice"><message to="{to}" from="{from}"><xsl:value-of select="body"/></message></xsl:template>
+</xsl:stylesheet>"""
+
+def bench_xslt(n: int = 2000):
+# small document through one transform: external xsltproc, compile per call, cached stylesheet
+    import shutil, subprocess
+    fd, xsl = tempfile.mkstemp(".xsl")
+    os.write(fd, XSL.encode()); os.close(fd)
+    x = xml(xmlReadMemory(NOTICE, "", "UTF-8", 0))
+    results = {}
+    if shutil.which("xsltproc"):
+        m = max(n // 20, 1)
+        results["xsltproc (fork/exec)"] = timeit.timeit(lambda: subprocess.run(["xsltproc", xsl, "-"], input=NOTICE.encode(), capture_output=True), number=m) * n / m
+    results["xmlStylesheet() per call"] = timeit.timeit(lambda: xmlStylesheet(xsl).Transform(x), number=n)
+    results["xmlLoadStylesheet (cached)"] = timeit.timeit(lambda: xmlLoadStylesheet(xsl).Transform(x), number=n)
+    _report("XSLT transform of a small document", results, n)
+    os.remove(xsl)
+
+def check_node_ptrs(rows: int = 2000):
+# NodePtrs() of a temporary result must stay valid: the array keeps the XPath result alive
+    x = xml(xmlReadMemory("<r>" + "".join(f"<i>{j}</i>" for j in range(rows)) + "</r>", "", "UTF-8", 0))
+    ptrs = x.XPathEval("//i").NodePtrs()
+    expected = ptrs.copy()
+    junk = [x.XPathEval(f"//i[{j}]") for j in range(1, 200)]    #   allocations that would reuse a freed nodeTab
+    assert (ptrs == expected).all(), "NodePtrs() array changed after its result was released"
+    assert [xmlNodeString(p) for p in ptrs.tolist()] == [str(j) for j in range(rows)]
+    del junk
+    print(f"NodePtrs lifetime check ok, {rows} nodes")
+
+def check_columns():
+# ExtractColumns' one-pass child/attribute columns must give what the per-row evaluation gives
+    values = ["1", " 2.5 ", "", "abc", "1e3", "-", "1e", "-.5", "x&amp;y", "&e;", "<![CDATA[c]]>", "a<b/>c"]
+    s = '<!DOCTYPE r [<!ENTITY e "ent">]><r>' + "".join(
+        f'<row id="{v if "<" not in v else j}"><name>{v}</name><name>second</name><sub><k>{j}</k></sub>'
+        + (f'<row id="{j}"><name>{v}</name></row>' if j % 3 == 0 else "") + '</row><row/>' for j, v in enumerate(values)) + '</r>'
+    x = xml(xmlReadMemory(s, "", "UTF-8", 0))
+    specs = [(f"{exp} {kind}", kind, exp) for exp in ("@id", "name", "name/text()", "*", "sub/k", "none") for kind in "nbs"]
+    with x.XPathEval("//row") as r: ptrs = numpy.array(r.NodePtrs())
+    for (name, kind, exp), a, b in zip(specs, x._columns("//row", specs), x._rowColumns(ptrs, specs)):
+        same = numpy.array_equal(a, b, equal_nan=True) if kind == "n" else (a == b).all()
+        assert same and (kind != "n" or (numpy.signbit(a[a == 0]) == numpy.signbit(b[a == 0])).all()), f"column {name}: {a} != {b}"
+    print(f"ExtractColumns check ok, {len(ptrs)} rows x {len(specs)} columns")
+
+def check_diff(rows: int = 100):
+# Diff() of a document with one record moved and one changed: the move is the parent's order, not a whole-tree change
+    doc = lambda ids, changed: "<orders>" + "".join(f'<order id="{j}"><v>{"x" if j == changed else ""}{j}</v></order>' for j in ids) + "</orders>"
+    ids = list(range(rows))
+    moved = ids[:10] + ids[11:] + [10]
+    old = xml(xmlReadMemory(doc(ids, None), "", "UTF-8", 0))
+    new = xml(xmlReadMemory(doc(moved, 50), "", "UTF-8", 0))
+    d = [(status, path) for status, path, a, b in old.Diff(new, key="id")]
+    assert d == [("order", "/orders"), ("changed", "/orders/order[@id='50']/v[1]")], d
+    d = [(status, path) for status, path, a, b in old.Diff(new, key="id", depth=1)]
+    assert d == [("order", "/orders"), ("changed", "/orders/order[@id='50']")], d
+    same = xml(xmlReadMemory(doc(moved, None), "", "UTF-8", 0))
+    assert [(status, path) for status, path, a, b in old.Diff(same, key="id")] == [("order", "/orders")]
+    print(f"Diff check ok, {rows} records")
+
+if __name__ == "__main__":
+    check_node_ptrs()
+    check_columns()
+    check_diff()
+    bench_prototypes()
+    bench_xpath_cache()
+    bench_nodeset()
+    bench_soak()
+    bench_reader()
+    bench_read_memory()
+    bench_batch()
+    bench_extract_pool()
+    bench_columns()
+    bench_node_proxy()
+    bench_shared_dict()
+    bench_doc_cache()
+    bench_serialize()
+    bench_edit()
+    bench_schema()
+    bench_index()
+    bench_threads()
+    bench_mem_instrument()
+    bench_async()
+    bench_diff()
+    bench_read_io()
+    bench_binding()
+    bench_xslt()
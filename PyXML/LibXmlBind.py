@@ -0,0 +1,678 @@
+# libxml2 binding layer: structures, DLL loading and function prototypes.
+'''
+The DLL is loaded once, on first use, and every prototype (restype/argtypes) is declared one time.
+Wrappers call the pre-bound function objects on "xml2", e.g. "xml2.xmlReadFile(...)", instead of
+setting up the prototype and checking "libXML == None" on every call.
+'''
+
+import atexit
+import contextlib
+import ctypes
+import itertools
+import threading
+import utils
+
+class PointerPtr(ctypes.Structure):
+    _fields_ = [
+        ("ptr",ctypes.c_void_p),        #    pointer
+    ]
+
+class xmlDoc(ctypes.Structure):
+    _fields_ = [
+        ("_private",ctypes.c_void_p),   #    application data
+        ("type",ctypes.c_uint16),       #    XML_DOCUMENT_NODE, must be second !
+        ("name",ctypes.c_char_p),       #    name/filename/URI of the document
+        ("children",ctypes.c_void_p),   #    the document tree
+        ("last",ctypes.c_void_p),       #    last child link
+        ("parent",ctypes.c_void_p),     #    child->parent link
+        ("next",ctypes.c_void_p),       #    next sibling link
+        ("prev",ctypes.c_void_p),       #    previous sibling link
+        ("doc",ctypes.c_void_p),        #    autoreference to itself End of common part
+        ("compression",ctypes.c_int),   #    level of zlib compression
+        ("standalone",ctypes.c_int),    #    standalone document (no external refs) 1 if standalone="yes" 0 if sta
+        ("intSubset",ctypes.c_void_p),  #    the document internal subset
+        ("extSubset",ctypes.c_void_p),  #    the document external subset
+        ("oldNs",ctypes.c_void_p),      #    Global namespace, the old way
+        ("version",ctypes.c_char_p),    #    the XML version string
+        ("encoding",ctypes.c_char_p),   #    external initial encoding, if any
+        ("ids",ctypes.c_void_p),        #    Hash table for ID attributes if any
+        ("refs",ctypes.c_void_p),       #    Hash table for IDREFs attributes if any
+        ("URL",ctypes.c_char_p),        #    The URI for that document
+        ("charset",ctypes.c_int),       #    Internal flag for charset handling, actually an xmlCharEncoding
+        ("dict",ctypes.c_void_p),       #    dict used to allocate names or NULL
+        ("psvi",ctypes.c_void_p),       #    for type/PSVI information
+        ("parseFlags",ctypes.c_int),    #    set of xmlParserOption used to parse the document
+        ("properties",ctypes.c_int),    #    set of xmlDocProperties for this document set at the end of parsing
+    ]
+
+class xmlNode(ctypes.Structure):
+    _fields_ = [
+        ("_private",ctypes.c_void_p),   #    application data
+        ("type",ctypes.c_int16),        #    type number, must be second !
+        ("name",ctypes.c_char_p),       #    the name of the node, or the entity
+        ("children",ctypes.c_void_p),   #    parent->childs link
+        ("last",ctypes.c_void_p),       #    last child link
+        ("parent",ctypes.c_void_p),     #    child->parent link
+        ("next",ctypes.c_void_p),       #    next sibling link
+        ("prev",ctypes.c_void_p),       #    previous sibling link
+        ("doc",ctypes.c_void_p),        #    the containing document End of common part
+        ("ns",ctypes.c_void_p),         #    pointer to the associated namespace
+        ("content",ctypes.c_void_p),    #    the content
+        ("properties",ctypes.c_char_p), #    properties list
+        ("nsDef",ctypes.c_char_p),      #    namespace definitions on this node
+        ("psvi",ctypes.c_void_p),       #    for type/PSVI information
+        ("line",ctypes.c_uint16),       #    line number
+        ("extra",ctypes.c_uint16),      #    extra data for XPath/XSLT
+    ]
+
+class xmlNs(ctypes.Structure):
+    _fields_ = [
+        ("next",ctypes.c_void_p),       #    next Ns link for this node
+        ("type",ctypes.c_int),          #    global or local
+        ("href",ctypes.c_char_p),       #    URL for the namespace
+        ("prefix",ctypes.c_char_p),     #    prefix for the namespace
+        ("_private",ctypes.c_void_p),   #    application data
+        ("context",ctypes.c_void_p),    #    normally an xmlDoc
+    ]
+
+class xmlError(ctypes.Structure):
+    _fields_ = [
+        ("domain",ctypes.c_int),        #    What part of the library raised this error
+        ("code",ctypes.c_int),          #    The error code, e.g. an xmlParserError
+        ("message",ctypes.c_char_p),    #    human-readable informative error message
+        ("level",ctypes.c_uint32),      #    how consequent is the error
+        ("file",ctypes.c_char_p),       #    the filename
+        ("line",ctypes.c_int),          #    the line number if available
+        ("str1",ctypes.c_char_p),       #    extra string information
+        ("str2",ctypes.c_char_p),       #    extra string information
+        ("str3",ctypes.c_char_p),       #    extra string information
+        ("int1",ctypes.c_int),          #    extra number information
+        ("int2",ctypes.c_int),          #    error column # or 0 if N/A (todo: rename field when we would brk ABI)
+        ("ctxt",ctypes.c_void_p),       #    the parser context if available
+        ("node",ctypes.c_void_p),       #    the node in the tree
+    ]
+
+class xmlXPathParserContext(ctypes.Structure):
+    _fields_ = [
+        ("cur",ctypes.c_char_p),        #    the current char being parsed
+        ("base",ctypes.c_void_p),       #    the full expression
+        ("error",ctypes.c_int),         #    error code
+        ("context",ctypes.c_char_p),    #    the evaluation context
+        ("value",ctypes.c_char_p),      #    the current value
+        ("valueNr",ctypes.c_int),       #    number of values stacked
+        ("valueMax",ctypes.c_int),      #    max number of values stacked
+        ("valueTab",ctypes.c_char_p),   #    stack of values
+        ("comp",ctypes.c_char_p),       #    the precompiled expression
+        ("xptr",ctypes.c_int),          #    it this an XPointer expression
+        ("ancestor",ctypes.c_char_p),   #    used for walking preceding axis
+        ("valueFrame",ctypes.c_int),    #    used to limit Pop on the stack
+    ]
+
+class xmlXPathObject(ctypes.Structure):
+    _fields_ = [
+        ("type",ctypes.c_int),          #    xmlXPathObjectType, see XPATH_TYPE
+        ("nodesetval",ctypes.c_void_p),
+        ("boolval",ctypes.c_int),
+        ("floatval",ctypes.c_double),
+        ("stringval",ctypes.c_void_p),
+        ("user",ctypes.c_void_p),
+        ("index",ctypes.c_int),
+        ("user2",ctypes.c_void_p),
+        ("index2",ctypes.c_int),
+    ]
+
+class xmlValidCtxt(ctypes.Structure):
+    _fields_ = [
+        ("userData",ctypes.c_void_p),   #    user specific data block
+        ("error",ctypes.c_void_p),      #    the callback in case of errors
+        ("warning",ctypes.c_void_p),    #    the callback in case of warning
+        ("node",ctypes.c_void_p),       #    Current parsed Node
+        ("nodeNr",ctypes.c_int),        #    Depth of the parsing stack
+        ("nodeMax",ctypes.c_int),       #    Max depth of the parsing stack
+        ("nodeTab",ctypes.c_void_p),    #    array of nodes
+        ("finishDtd",ctypes.c_uint),    #    finished validating the Dtd ?
+        ("doc",ctypes.c_void_p),        #    the document
+        ("valid",ctypes.c_int),         #    temporary validity check result
+        ("vstate",ctypes.c_void_p),     #    current state
+        ("vstateNr",ctypes.c_int),      #    Depth of the validation stack
+        ("vstateMax",ctypes.c_int),     #    Max depth of the validation stack
+        ("vstateTab",ctypes.c_void_p),  #    array of validation states
+        ("am",ctypes.c_void_p),         #    the automata
+        ("state",ctypes.c_void_p),      #    used to build the automata
+    ]
+
+class xmlParserCtxt(ctypes.Structure):     #   leading fields (up to "dict") only, always used through a pointer
+    _fields_ = [
+        ("sax",ctypes.c_void_p),        #    The SAX handler
+        ("userData",ctypes.c_void_p),   #    For SAX interface only, used by DOM build
+        ("myDoc",ctypes.c_void_p),      #    the document being built
+        ("wellFormed",ctypes.c_int),    #    is the document well formed
+        ("replaceEntities",ctypes.c_int),   #    shall we replace entities ?
+        ("version",ctypes.c_char_p),    #    the XML version string
+        ("encoding",ctypes.c_char_p),   #    the declared encoding, if any
+        ("standalone",ctypes.c_int),    #    standalone document
+        ("html",ctypes.c_int),          #    an HTML(1)/Docbook(2) document
+        ("input",ctypes.c_void_p),      #    Current input stream
+        ("inputNr",ctypes.c_int),       #    Number of current input streams
+        ("inputMax",ctypes.c_int),      #    Max number of input streams
+        ("inputTab",ctypes.c_void_p),   #    stack of inputs
+        ("node",ctypes.c_void_p),       #    Current parsed Node
+        ("nodeNr",ctypes.c_int),        #    Depth of the parsing stack
+        ("nodeMax",ctypes.c_int),       #    Max depth of the parsing stack
+        ("nodeTab",ctypes.c_void_p),    #    array of nodes
+        ("record_info",ctypes.c_int),   #    Whether node info should be kept
+        ("node_seq_maximum",ctypes.c_ulong),    #    node_seq: info about each node parsed
+        ("node_seq_length",ctypes.c_ulong),
+        ("node_seq_buffer",ctypes.c_void_p),
+        ("errNo",ctypes.c_int),         #    error code
+        ("hasExternalSubset",ctypes.c_int), #    reference and external subset
+        ("hasPErefs",ctypes.c_int),     #    the internal subset has PE refs
+        ("external",ctypes.c_int),      #    are we parsing an external entity
+        ("valid",ctypes.c_int),         #    is the document valid
+        ("validate",ctypes.c_int),      #    shall we try to validate ?
+        ("vctxt",xmlValidCtxt),         #    The validity context
+        ("instate",ctypes.c_int),       #    current type of input
+        ("token",ctypes.c_int),         #    next char look-ahead
+        ("directory",ctypes.c_char_p),  #    the data directory
+        ("name",ctypes.c_char_p),       #    Current parsed Node
+        ("nameNr",ctypes.c_int),        #    Depth of the parsing stack
+        ("nameMax",ctypes.c_int),       #    Max depth of the parsing stack
+        ("nameTab",ctypes.c_void_p),    #    array of nodes
+        ("nbChars",ctypes.c_long),      #    unused
+        ("checkIndex",ctypes.c_long),   #    used by progressive parsing lookup
+        ("keepBlanks",ctypes.c_int),    #    ugly but ...
+        ("disableSAX",ctypes.c_int),    #    SAX callbacks are disabled
+        ("inSubset",ctypes.c_int),      #    Parsing is in int 1/ext 2 subset
+        ("intSubName",ctypes.c_char_p), #    name of subset
+        ("extSubURI",ctypes.c_char_p),  #    URI of external subset
+        ("extSubSystem",ctypes.c_char_p),   #    SYSTEM ID of external subset
+        ("space",ctypes.c_void_p),      #    Should we preserve spaces
+        ("spaceNr",ctypes.c_int),       #    Depth of the parsing stack
+        ("spaceMax",ctypes.c_int),      #    Max depth of the parsing stack
+        ("spaceTab",ctypes.c_void_p),   #    array of space infos
+        ("depth",ctypes.c_int),         #    to prevent entity substitution loops
+        ("entity",ctypes.c_void_p),     #    used to check entities boundaries
+        ("charset",ctypes.c_int),       #    encoding of the in-memory content
+        ("nodelen",ctypes.c_int),       #    Those two fields are there to
+        ("nodemem",ctypes.c_int),       #    Speed up large node parsing
+        ("pedantic",ctypes.c_int),      #    signal pedantic warnings
+        ("_private",ctypes.c_void_p),   #    For user data, libxml won't touch it
+        ("loadsubset",ctypes.c_int),    #    should the external subset be loaded
+        ("linenumbers",ctypes.c_int),   #    set line number in element content
+        ("catalogs",ctypes.c_void_p),   #    document's own catalog
+        ("recovery",ctypes.c_int),      #    run in recovery mode
+        ("progressive",ctypes.c_int),   #    is this a progressive parsing
+        ("dict",ctypes.c_void_p),       #    dictionary for the parser
+    ]
+
+class xmlNodeSet(ctypes.Structure):
+    _fields_ = [
+        ("nodeNr",ctypes.c_int),        #    number of nodes in the set
+        ("nodeMax",ctypes.c_int),       #    size of the array as allocated
+        ("nodeTab",ctypes.c_void_p),    #    array of nodes in no particular order @@ with_ns to check whether nam
+    ]
+
+class XML_PARSE:               #   xmlParserOption, combine with | for the "options" arguments
+    RECOVER = 1 << 0            #   recover on errors
+    NOENT = 1 << 1              #   substitute entities
+    DTDLOAD = 1 << 2            #   load the external subset
+    DTDATTR = 1 << 3            #   default DTD attributes
+    DTDVALID = 1 << 4           #   validate with the DTD
+    NOERROR = 1 << 5            #   suppress error reports
+    NOWARNING = 1 << 6          #   suppress warning reports
+    PEDANTIC = 1 << 7           #   pedantic error reporting
+    NOBLANKS = 1 << 8           #   remove blank nodes
+    XINCLUDE = 1 << 10          #   implement XInclude substitution
+    NONET = 1 << 11             #   Forbid network access
+    NODICT = 1 << 12            #   Do not reuse the context dictionary
+    NSCLEAN = 1 << 13           #   remove redundant namespaces declarations
+    NOCDATA = 1 << 14           #   merge CDATA as text nodes
+    NOXINCNODE = 1 << 15        #   do not generate XINCLUDE START/END nodes
+    COMPACT = 1 << 16           #   compact small text nodes
+    NOBASEFIX = 1 << 18         #   do not fixup XINCLUDE xml:base uris
+    HUGE = 1 << 19              #   relax any hardcoded limit from the parser
+    BIG_LINES = 1 << 22         #   Store big lines numbers in text PSVI field
+
+xmlParseProfiles = {          #   named xmlParserOption combinations, usable wherever "options" is taken
+    "default":  0,
+    "lean":     XML_PARSE.COMPACT | XML_PARSE.NOBLANKS | XML_PARSE.NONET,   #   smallest tree for data documents
+    "huge":     XML_PARSE.COMPACT | XML_PARSE.NOBLANKS | XML_PARSE.NONET | XML_PARSE.HUGE, #   lean, no size limits
+    "safe":     XML_PARSE.NONET,    #   untrusted input: no network access, entities left unexpanded
+}
+
+def xmlParseOptions(options) -> int:
+# xmlParserOption bits for an int or an xmlParseProfiles name
+    if isinstance(options, str):
+        if options not in xmlParseProfiles: raise ValueError(f"Unknown parse profile '{options}'")
+        return xmlParseProfiles[options]
+    return options
+
+class XML_ERR_LEVEL:           #   xmlErrorLevel, LibErr.level
+    NONE = 0
+    WARNING = 1                 #   A simple warning
+    ERROR = 2                   #   A recoverable error
+    FATAL = 3                   #   A fatal error
+
+class XPATH_TYPE:              #   xmlXPathObjectType
+    UNDEFINED = 0
+    NODESET = 1
+    BOOLEAN = 2
+    NUMBER = 3
+    STRING = 4
+
+class XML_NODE_TYPE:           #   xmlElementType, xmlNode.type
+    ELEMENT = 1
+    ATTRIBUTE = 2
+    TEXT = 3
+    CDATA_SECTION = 4
+    ENTITY_REF = 5
+    PI = 7
+    COMMENT = 8
+    DOCUMENT = 9
+    NAMESPACE_DECL = 18
+
+class XML_READER_TYPE:         #   xmlReaderTypes, xmlTextReaderNodeType() return values
+    ELEMENT = 1
+    TEXT = 3
+    END_ELEMENT = 15
+
+if utils.os == 'Linux':
+    if utils.x64: libXmlPath = "/usr/lib64/libxml2.so.2"
+    else: libXmlPath = "/usr/lib/libxml2.so.2"
+else:
+    libXmlPath = "C:\\Users\\dholstein\\Documents\\XML\\lib\\libxml2.dll"
+libXML = None
+
+if utils.os == 'Linux':
+    if utils.x64: libXsltPath = "/usr/lib64/libxslt.so.1"
+    else: libXsltPath = "/usr/lib/libxslt.so.1"
+else:
+    libXsltPath = "C:\\Users\\dholstein\\Documents\\XML\\lib\\libxslt.dll"
+libXSLT = None
+
+class NullDLL(Exception):
+    """Exception raised if "libXML = None"
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message="DLL not loaded"):
+        self.message = message
+        super().__init__(self.message)
+
+class xmlNullPtr(Exception):
+    """Exception raised if "xmlDocPtr = NULL"
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message="XML Document pointer may not be NULL"):
+        self.message = message
+        super().__init__(self.message)
+
+class LibErr(Exception):
+    """Exception raised for a libxml2 error
+
+    Attributes:
+        err -- XML error structure (copied, the structure itself is reused by libxml2),
+               or the message itself
+        domain, code, level, file, line, column, str1, str2, str3, int1 -- the xmlError fields
+    """
+
+    def __init__(self, err=None):
+        self.domain = self.code = self.level = self.line = self.column = self.int1 = 0
+        self.file = self.str1 = self.str2 = self.str3 = None
+        if isinstance(err, str):
+            self.message = err
+        elif not err:
+            self.message = "undefined libxml2 error"
+        else:
+            e = err.contents
+            text = lambda s: s.decode("utf-8", "replace") if s else None
+            self.domain, self.code, self.level = e.domain, e.code, e.level
+            self.file, self.line, self.column = text(e.file), e.line, e.int2
+            self.str1, self.str2, self.str3, self.int1 = text(e.str1), text(e.str2), text(e.str3), e.int1
+            self.message = (self.file or "") + " line:" + str(self.line) + " col:" + str(self.column) + " msg:" + (text(e.message) or "").rstrip()
+        super().__init__(self.message)
+
+    def __reduce__(self):   #   pickle with the structured fields
+        return (LibErr, (self.message,), self.__dict__)
+
+def SetLibXmlPath(path: str):
+# Must be called before the first libxml2 call, the DLL is only loaded once.
+    global libXmlPath
+    libXmlPath = path
+
+def SetLibXsltPath(path: str):
+# Must be called before the first libxslt call, the DLL is only loaded once.
+    global libXsltPath
+    libXsltPath = path
+
+xmlFreeFunc = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+xmlMallocFunc = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_size_t)
+xmlReallocFunc = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t)
+xmlStrdupFunc = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p)
+xmlStructuredErrorFunc = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.POINTER(xmlError))
+xsltGenericErrorFunc = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_void_p)    #   (ctx, format, first vararg)
+xmlInputReadCallback = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int)
+xmlInputCloseCallback = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p)
+
+class xmlMemCounters:
+    '''
+    Opt-in accounting of libxml2's heap (see xmlMemInstrument). libxml2's allocator is replaced with
+    xmlGcMemSetup by callbacks that call the C library's malloc/realloc/free and count the blocks:
+    live bytes and blocks, peak live bytes, and live bytes per tag. The tag is the calling thread's
+    xmlMemTag() at allocation time (e.g. "doc:orders.xml#3", "xpath:orders.xml#3"), "" outside any tag.
+    Document tags end with the document's number, so in-memory documents ("doc:<memory>#7") are told apart.
+    Each allocation costs a Python callback, so this is for diagnosis, not production speed.
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()  #   "tag": current tag of the thread
+        self.blocks = {}    #   address: (size, tag)
+        self.tags = {}      #   tag: [bytes, blocks]
+        self.live = self.peak = self.allocs = self.frees = 0
+        self.funcs = None   #   the ctypes callbacks, referenced for as long as libxml2 may call them
+        self.docIds = itertools.count(1)    #   document numbers for the tags, kept in xmlDoc._private
+
+    def add(self, p: int, size: int):
+        tag = getattr(self.local, "tag", "")
+        with self.lock:
+            self.blocks[p] = (size, tag)
+            t = self.tags.get(tag)
+            if t == None: t = self.tags[tag] = [0, 0]
+            t[0] += size
+            t[1] += 1
+            self.live += size
+            self.allocs += 1
+            if self.live > self.peak: self.peak = self.live
+
+    def remove(self, p: int):
+        with self.lock:
+            b = self.blocks.pop(p, None)
+            if b == None: return    #   allocated before instrumentation
+            t = self.tags[b[1]]
+            t[0] -= b[0]
+            t[1] -= 1
+            self.live -= b[0]
+            self.frees += 1
+
+    def snapshot(self, reset_peak: bool = False) -> dict:
+        with self.lock:
+            snap = {"enabled": self.enabled, "live_bytes": self.live, "live_blocks": len(self.blocks),
+                    "peak_bytes": self.peak, "allocs": self.allocs, "frees": self.frees,
+                    "tags": {tag: {"bytes": t[0], "blocks": t[1]} for tag, t in self.tags.items() if t[1]}}
+            if reset_peak: self.peak = self.live
+        return snap
+
+xmlMem = xmlMemCounters()
+
+def xmlMemInstrument():
+# Enable xmlMem accounting. Must be called before the first libxml2 call: the allocator is installed
+# by LoadLibXml() before xmlInitParser(), so every block libxml2 owns is counted.
+    if libXML != None: raise RuntimeError("xmlMemInstrument() must be called before libxml2 is loaded")
+    xmlMem.enabled = True
+
+def xmlMemSnapshot(reset_peak: bool = False) -> dict:
+# Counters for scraping: live_bytes, live_blocks, peak_bytes (since start or the last reset), allocs,
+# frees, and "tags": {tag: {"bytes", "blocks"}} for the tags still holding memory.
+    return xmlMem.snapshot(reset_peak)
+
+def xmlMemTag(kind: str, name = None):
+# Context manager attributing the thread's libxml2 allocations to "kind:name" while instrumented.
+#     name:	a str, or an xmlDoc pointer (tagged by its URL, "<memory>" if it has none, and its number: "<memory>#7")
+    if not xmlMem.enabled: return contextlib.nullcontext()
+    if name != None and not isinstance(name, str): name = _xmlMemDocName(name)
+    return _xmlMemTag(f"{kind}:{name}" if name else kind)
+
+def _xmlMemDocName(pDoc) -> str:    #   "URL#n", numbering the document on first use if it wasn't parsed under xmlMemDocTag
+    if not pDoc: return "<memory>"
+    d = pDoc.contents
+    if not d._private: d._private = next(xmlMem.docIds)
+    return f"{d.URL.decode('utf-8', 'replace') if d.URL else '<memory>'}#{d._private}"
+
+class xmlMemDocTag():
+    '''
+    Tags a parse as "doc:name#n" while instrumented, n a new document number; doc() stores n in the parsed
+    xmlDoc, so the document's later tags (xmlMemTag(kind, pDoc)) carry the same "name#n".
+        with xmlMemDocTag(URL or "<memory>") as t: pDoc = t.doc(xml2.xmlReadMemory(...))
+    '''
+    def __init__(self, name: str):
+        self.n = next(xmlMem.docIds) if xmlMem.enabled else None
+        self.tag = _xmlMemTag(f"doc:{name}#{self.n}") if self.n else contextlib.nullcontext()
+
+    def __enter__(self):
+        self.tag.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.tag.__exit__(exc_type, exc_value, traceback)
+
+    def doc(self, pDoc):    #   pDoc, numbered
+        if pDoc and self.n: pDoc.contents._private = self.n
+        return pDoc
+
+@contextlib.contextmanager
+def _xmlMemTag(tag: str):
+    local = xmlMem.local
+    prev = getattr(local, "tag", "")
+    local.tag = tag
+    try: yield
+    finally: local.tag = prev
+
+def _xmlMemSetup(lib):     #   install the counting allocator, called by LoadLibXml()
+    if utils.os == 'Linux': libc = ctypes.CDLL(None)
+    else: libc = ctypes.cdll.msvcrt
+    malloc, realloc, free = libc.malloc, libc.realloc, libc.free
+    malloc.restype, malloc.argtypes = ctypes.c_void_p, (ctypes.c_size_t,)
+    realloc.restype, realloc.argtypes = ctypes.c_void_p, (ctypes.c_void_p, ctypes.c_size_t)
+    free.restype, free.argtypes = None, (ctypes.c_void_p,)
+    strlen = libc.strlen
+    strlen.restype, strlen.argtypes = ctypes.c_size_t, (ctypes.c_void_p,)
+
+    @xmlMallocFunc
+    def Malloc(size):
+        p = malloc(size)
+        if p: xmlMem.add(p, size)
+        return p
+
+    @xmlReallocFunc
+    def Realloc(p, size):
+        q = realloc(p, size)
+        if q:
+            if p: xmlMem.remove(p)
+            xmlMem.add(q, size)
+        return q
+
+    @xmlFreeFunc
+    def Free(p):
+        if p: xmlMem.remove(p)
+        free(p)
+
+    @xmlStrdupFunc
+    def Strdup(s):
+        size = strlen(s) + 1
+        p = malloc(size)
+        if p:
+            ctypes.memmove(p, s, size)
+            xmlMem.add(p, size)
+        return p
+
+    setup = lib.xmlGcMemSetup
+    setup.restype = ctypes.c_int
+    setup.argtypes = (xmlFreeFunc, xmlMallocFunc, xmlMallocFunc, xmlReallocFunc, xmlStrdupFunc)
+    xmlMem.funcs = (Free, Malloc, Realloc, Strdup)
+    if setup(Free, Malloc, Malloc, Realloc, Strdup) != 0: raise LibErr("xmlGcMemSetup failed")
+
+    #   The blocks are plain C heap blocks, so at exit the C functions can take over again: libxml2 may
+    #   still free memory after the interpreter (and the callbacks) are gone.
+    c = lambda f, t: ctypes.cast(f, t)
+    def restore():
+        xmlMem.enabled = False
+        setup(c(free, xmlFreeFunc), c(malloc, xmlMallocFunc), c(malloc, xmlMallocFunc),
+              c(realloc, xmlReallocFunc), c(libc.strdup, xmlStrdupFunc))
+    atexit.register(restore)
+
+#   name, restype, argtypes
+xmlPrototypes = [
+    ("xmlInitParser",           None,                                   ()),
+    ("xmlGetLastError",         ctypes.POINTER(xmlError),               ()),
+    ("xmlResetLastError",       None,                                   ()),
+    ("xmlSetStructuredErrorFunc", None,                                 (ctypes.c_void_p, xmlStructuredErrorFunc)),
+    ("xmlReadFile",             ctypes.POINTER(xmlDoc),                 (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int32)),
+    ("xmlReadMemory",           ctypes.POINTER(xmlDoc),                 (ctypes.c_void_p, ctypes.c_int32, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int32)),
+    ("xmlReadIO",               ctypes.POINTER(xmlDoc),                 (xmlInputReadCallback, xmlInputCloseCallback, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)),
+    ("xmlCopyDoc",              ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_int)),
+    ("xmlFreeDoc",              None,                                   (ctypes.c_void_p,)),
+    ("xmlDocGetRootElement",    ctypes.POINTER(xmlNode),                (ctypes.c_void_p,)),
+    ("xmlXPathNewContext",      ctypes.POINTER(xmlXPathParserContext),  (ctypes.c_void_p,)),
+    ("xmlXPathFreeContext",     None,                                   (ctypes.c_void_p,)),
+    ("xmlXPathEval",            ctypes.POINTER(xmlXPathObject),         (ctypes.c_char_p, ctypes.c_void_p)),
+    ("xmlXPathFreeObject",      None,                                   (ctypes.c_void_p,)),
+    ("xmlXPathCompile",         ctypes.c_void_p,                        (ctypes.c_char_p,)),
+    ("xmlXPathCompiledEval",    ctypes.POINTER(xmlXPathObject),         (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlXPathFreeCompExpr",    None,                                   (ctypes.c_void_p,)),
+    ("xmlXPathSetContextNode",  ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlDictCreate",           ctypes.c_void_p,                        ()),
+    ("xmlDictReference",        ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlDictFree",             None,                                   (ctypes.c_void_p,)),
+    ("xmlDictSize",             ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlNewParserCtxt",        ctypes.POINTER(xmlParserCtxt),          ()),
+    ("xmlCtxtReadFile",         ctypes.POINTER(xmlDoc),                 (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)),
+    ("xmlCtxtReadMemory",       ctypes.POINTER(xmlDoc),                 (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)),
+    ("xmlCreatePushParserCtxt", ctypes.POINTER(xmlParserCtxt),          (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p)),
+    ("xmlCtxtUseOptions",       ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_int)),
+    ("xmlParseChunk",           ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int)),
+    ("xmlFreeParserCtxt",       None,                                   (ctypes.c_void_p,)),
+    ("xmlCtxtGetLastError",     ctypes.POINTER(xmlError),               (ctypes.c_void_p,)),
+    ("xmlNodeGetContent",       ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlGetLineNo",            ctypes.c_long,                          (ctypes.c_void_p,)),
+    ("xmlGetProp",              ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlNewChild",             ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p)),
+    ("xmlAddChild",             ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlUnlinkNode",           None,                                   (ctypes.c_void_p,)),
+    ("xmlFreeNode",             None,                                   (ctypes.c_void_p,)),
+    ("xmlGetID",                ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlSetProp",              ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p)),
+    ("xmlUnsetProp",            ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlNodeSetContent",       None,                                   (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlNodeAddContent",       None,                                   (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlXPathCastNodeToString",ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlDocDumpFormatMemoryEnc", None,                                 (ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(ctypes.c_int), ctypes.c_char_p, ctypes.c_int)),
+    ("xmlBufferCreate",         ctypes.c_void_p,                        ()),
+    ("xmlBufferFree",           None,                                   (ctypes.c_void_p,)),
+    ("xmlBufferContent",        ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlBufferLength",         ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlBufferEmpty",          None,                                   (ctypes.c_void_p,)),
+    ("xmlNodeDump",             ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int)),
+    ("xmlNewTextWriterFilename", ctypes.c_void_p,                       (ctypes.c_char_p, ctypes.c_int)),
+    ("xmlNewTextWriterMemory",  ctypes.c_void_p,                        (ctypes.c_void_p, ctypes.c_int)),
+    ("xmlFreeTextWriter",       None,                                   (ctypes.c_void_p,)),
+    ("xmlTextWriterSetIndent",  ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_int)),
+    ("xmlTextWriterStartDocument", ctypes.c_int,                        (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p)),
+    ("xmlTextWriterEndDocument", ctypes.c_int,                          (ctypes.c_void_p,)),
+    ("xmlTextWriterStartElement", ctypes.c_int,                         (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlTextWriterEndElement", ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlTextWriterWriteAttribute", ctypes.c_int,                       (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p)),
+    ("xmlTextWriterWriteString", ctypes.c_int,                          (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlTextWriterWriteElement", ctypes.c_int,                         (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p)),
+    ("xmlTextWriterWriteComment", ctypes.c_int,                         (ctypes.c_void_p, ctypes.c_char_p)),
+    ("xmlTextWriterFlush",      ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlSchemaNewParserCtxt",  ctypes.c_void_p,                        (ctypes.c_char_p,)),
+    ("xmlSchemaParse",          ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlSchemaFreeParserCtxt", None,                                   (ctypes.c_void_p,)),
+    ("xmlSchemaFree",           None,                                   (ctypes.c_void_p,)),
+    ("xmlSchemaNewValidCtxt",   ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlSchemaFreeValidCtxt",  None,                                   (ctypes.c_void_p,)),
+    ("xmlSchemaValidateDoc",    ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlSchemaSetValidStructuredErrors", None,                         (ctypes.c_void_p, xmlStructuredErrorFunc, ctypes.c_void_p)),
+    ("xmlRelaxNGNewParserCtxt", ctypes.c_void_p,                        (ctypes.c_char_p,)),
+    ("xmlRelaxNGParse",         ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlRelaxNGFreeParserCtxt", None,                                  (ctypes.c_void_p,)),
+    ("xmlRelaxNGFree",          None,                                   (ctypes.c_void_p,)),
+    ("xmlRelaxNGNewValidCtxt",  ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xmlRelaxNGFreeValidCtxt", None,                                   (ctypes.c_void_p,)),
+    ("xmlRelaxNGValidateDoc",   ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlRelaxNGSetValidStructuredErrors", None,                        (ctypes.c_void_p, xmlStructuredErrorFunc, ctypes.c_void_p)),
+    ("xmlTextReaderSetSchema",  ctypes.c_int,                           (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlTextReaderRelaxNGSetSchema", ctypes.c_int,                     (ctypes.c_void_p, ctypes.c_void_p)),
+    ("xmlTextReaderIsValid",    ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlReaderForFile",        ctypes.c_void_p,                        (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)),
+    ("xmlReaderForIO",          ctypes.c_void_p,                        (xmlInputReadCallback, xmlInputCloseCallback, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int)),
+    ("xmlFreeTextReader",       None,                                   (ctypes.c_void_p,)),
+    ("xmlTextReaderRead",       ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlTextReaderNext",       ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlTextReaderNodeType",   ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlTextReaderDepth",      ctypes.c_int,                           (ctypes.c_void_p,)),
+    ("xmlTextReaderConstName",  ctypes.c_char_p,                        (ctypes.c_void_p,)),
+    ("xmlTextReaderExpand",     ctypes.POINTER(xmlNode),                (ctypes.c_void_p,)),
+    ("xmlTextReaderCurrentDoc", ctypes.POINTER(xmlDoc),                 (ctypes.c_void_p,)),
+]
+
+xsltPrototypes = [
+    ("xsltParseStylesheetFile", ctypes.c_void_p,                        (ctypes.c_char_p,)),
+    ("xsltParseStylesheetDoc",  ctypes.c_void_p,                        (ctypes.c_void_p,)),
+    ("xsltFreeStylesheet",      None,                                   (ctypes.c_void_p,)),
+    ("xsltApplyStylesheet",     ctypes.POINTER(xmlDoc),                 (ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(ctypes.c_char_p))),
+    ("xsltSetGenericErrorFunc", None,                                   (ctypes.c_void_p, xsltGenericErrorFunc)),
+    ("xsltSaveResultToString",  ctypes.c_int,                           (ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(ctypes.c_int), ctypes.c_void_p, ctypes.c_void_p)),
+]
+
+class xmlBindings:
+    '''
+    Pre-bound library functions. Attributes are filled in by the loader (LoadLibXml, LoadLibXslt), until then any
+    attribute access loads the DLL first. After loading, lookups are plain instance attributes (no load check).
+    '''
+    def __init__(self, load, lib: str):
+        self._load = load
+        self._lib = lib
+
+    def __getattr__(self, name: str):   #   only reached for names not bound yet
+        if name[0] != "_" and self._load() != None and name in self.__dict__: return self.__dict__[name]
+        raise AttributeError(f"{self._lib} function '{name}' has no prototype in LibXmlBind")
+
+xml2 = xmlBindings(lambda: LoadLibXml(), "libxml2")
+xslt = xmlBindings(lambda: LoadLibXslt(), "libxslt")
+
+def LoadLibXml():
+# Load DLL into memory and declare every prototype in xmlPrototypes once.
+    global libXML
+    if libXML != None: return libXML
+    try:
+        if utils.os == 'Linux': lib = ctypes.CDLL (libXmlPath)
+        else: lib = ctypes.WinDLL (libXmlPath)
+    except OSError as e:
+        raise NullDLL(f"DLL not loaded: {e}")
+
+    if xmlMem.enabled: _xmlMemSetup(lib)   #   before xmlInitParser() and any allocation
+    for name, restype, argtypes in xmlPrototypes:
+        f = getattr(lib, name)
+        f.restype = restype
+        f.argtypes = argtypes
+        setattr(xml2, name, f)
+    xml2.xmlFree = xmlFreeFunc.in_dll(lib, "xmlFree")   #   a global function pointer, not an exported function
+    libXML = lib
+    xml2.xmlInitParser()
+    return libXML
+
+def LoadLibXslt():
+# Load libxslt (after libxml2, which it uses) and declare the prototypes in xsltPrototypes once.
+    global libXSLT
+    if libXSLT != None: return libXSLT
+    LoadLibXml()
+    try:
+        if utils.os == 'Linux': lib = ctypes.CDLL (libXsltPath)
+        else: lib = ctypes.WinDLL (libXsltPath)
+    except OSError as e:
+        raise NullDLL(f"DLL not loaded: {e}")
+
+    for name, restype, argtypes in xsltPrototypes:
+        f = getattr(lib, name)
+        f.restype = restype
+        f.argtypes = argtypes
+        setattr(xslt, name, f)
+    libXSLT = lib
+    return libXSLT
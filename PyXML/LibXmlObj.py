@@ -5,357 +5,1459 @@ which means documents and nodes can be shared with C/C++ code/objects directly.
 '''
 
 import ctypes
+import hashlib
+import os
+import re
 from pydoc import doc
 import sys
-from PyQt5.QtWidgets import (
-    QApplication, 
-    QFileDialog
-)
+import numpy
 from numpy import array
 # import MessageBox as M
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import utils
+import LibXmlBind
+import LibXML
+from LibXML import *        #   libxml2 function wrappers (and the LibXmlBind structures/exceptions)
 
-class PointerPtr(ctypes.Structure):
-    _fields_ = [
-        ("ptr",ctypes.c_void_p),        #    pointer
-    ]
-
-class xmlDoc(ctypes.Structure):
-    _fields_ = [
-        ("_private",ctypes.c_void_p),   #    application data
-        ("type",ctypes.c_uint16),       #    XML_DOCUMENT_NODE, must be second !
-        ("name",ctypes.c_char_p),       #    name/filename/URI of the document
-        ("children",ctypes.c_void_p),   #    the document tree
-        ("last",ctypes.c_void_p),       #    last child link
-        ("parent",ctypes.c_void_p),     #    child->parent link
-        ("next",ctypes.c_void_p),       #    next sibling link
-        ("prev",ctypes.c_void_p),       #    previous sibling link
-        ("doc",ctypes.c_void_p),        #    autoreference to itself End of common part
-        ("compression",ctypes.c_int),   #    level of zlib compression
-        ("standalone",ctypes.c_int),    #    standalone document (no external refs) 1 if standalone="yes" 0 if sta
-        ("intSubset",ctypes.c_void_p),  #    the document internal subset
-        ("extSubset",ctypes.c_void_p),  #    the document external subset
-        ("oldNs",ctypes.c_void_p),      #    Global namespace, the old way
-        ("version",ctypes.c_char_p),    #    the XML version string
-        ("encoding",ctypes.c_char_p),   #    external initial encoding, if any
-        ("ids",ctypes.c_void_p),        #    Hash table for ID attributes if any
-        ("refs",ctypes.c_void_p),       #    Hash table for IDREFs attributes if any
-        ("URL",ctypes.c_char_p),        #    The URI for that document
-        ("charset",ctypes.c_int),       #    Internal flag for charset handling, actually an xmlCharEncoding
-        ("dict",ctypes.c_void_p),       #    dict used to allocate names or NULL
-        ("psvi",ctypes.c_void_p),       #    for type/PSVI information
-        ("parseFlags",ctypes.c_int),    #    set of xmlParserOption used to parse the document
-        ("properties",ctypes.c_int),    #    set of xmlDocProperties for this document set at the end of parsing
-    ]
-
-class xmlNode(ctypes.Structure):
-    _fields_ = [
-        ("_private",ctypes.c_void_p),   #    application data
-        ("type",ctypes.c_int16),        #    type number, must be second !
-        ("name",ctypes.c_char_p),       #    the name of the node, or the entity
-        ("children",ctypes.c_void_p),   #    parent->childs link
-        ("last",ctypes.c_void_p),       #    last child link
-        ("parent",ctypes.c_void_p),     #    child->parent link
-        ("next",ctypes.c_void_p),       #    next sibling link
-        ("prev",ctypes.c_void_p),       #    previous sibling link
-        ("doc",ctypes.c_void_p),        #    the containing document End of common part
-        ("ns",ctypes.c_void_p),         #    pointer to the associated namespace
-        ("content",ctypes.c_void_p),    #    the content
-        ("properties",ctypes.c_char_p), #    properties list
-        ("nsDef",ctypes.c_char_p),      #    namespace definitions on this node
-        ("psvi",ctypes.c_void_p),       #    for type/PSVI information
-        ("line",ctypes.c_uint16),       #    line number
-        ("extra",ctypes.c_uint16),      #    extra data for XPath/XSLT
-    ]
-
-class xmlError(ctypes.Structure):
-    _fields_ = [
-        ("domain",ctypes.c_int),        #    What part of the library raised this error
-        ("code",ctypes.c_int),          #    The error code, e.g. an xmlParserError
-        ("message",ctypes.c_char_p),    #    human-readable informative error message
-        ("level",ctypes.c_uint32),      #    how consequent is the error
-        ("file",ctypes.c_char_p),       #    the filename
-        ("line",ctypes.c_int),          #    the line number if available
-        ("str1",ctypes.c_char_p),       #    extra string information
-        ("str2",ctypes.c_char_p),       #    extra string information
-        ("str3",ctypes.c_char_p),       #    extra string information
-        ("int1",ctypes.c_int),          #    extra number information
-        ("int2",ctypes.c_int),          #    error column # or 0 if N/A (todo: rename field when we would brk ABI)
-        ("ctxt",ctypes.c_void_p),       #    the parser context if available
-        ("node",ctypes.c_void_p),       #    the node in the tree
-    ]
-
-class xmlXPathParserContext(ctypes.Structure):
-    _fields_ = [
-        ("cur",ctypes.c_char_p),        #    the current char being parsed
-        ("base",ctypes.c_void_p),       #    the full expression
-        ("error",ctypes.c_int),         #    error code
-        ("context",ctypes.c_char_p),    #    the evaluation context
-        ("value",ctypes.c_char_p),      #    the current value
-        ("valueNr",ctypes.c_int),       #    number of values stacked
-        ("valueMax",ctypes.c_int),      #    max number of values stacked
-        ("valueTab",ctypes.c_char_p),   #    stack of values
-        ("comp",ctypes.c_char_p),       #    the precompiled expression
-        ("xptr",ctypes.c_int),          #    it this an XPointer expression
-        ("ancestor",ctypes.c_char_p),   #    used for walking preceding axis
-        ("valueFrame",ctypes.c_int),    #    used to limit Pop on the stack
-    ]
-
-class xmlXPathObject(ctypes.Structure):
-    _fields_ = [
-        ("type",ctypes.c_char_p), 
-        ("nodesetval",ctypes.c_void_p), 
-        ("boolval",ctypes.c_int), 
-        ("floatval",ctypes.c_double), 
-        ("stringval",ctypes.c_void_p), 
-        ("user",ctypes.c_void_p), 
-        ("index",ctypes.c_int), 
-        ("user2",ctypes.c_void_p), 
-        ("index2",ctypes.c_int), 
-    ]
-
-class xmlNodeSet(ctypes.Structure):
-    _fields_ = [
-        ("nodeNr",ctypes.c_int),        #    number of nodes in the set
-        ("nodeMax",ctypes.c_int),       #    size of the array as allocated
-        ("nodeTab",ctypes.c_void_p),    #    array of nodes in no particular order @@ with_ns to check whether nam
-    ]
-
-if utils.os == 'Linux':
-    if utils.x64: libXmlPath = "/usr/lib64/libxml2.so.2"
-    else: libXmlPath = "/usr/lib/libxml2.so.2"
-else:
-    libXmlPath = "C:\\Users\\dholstein\\Documents\\XML\\lib\\libxml2.dll"
-libXML = None
-
-class NullDLL(Exception):
-    """Exception raised if "libXML = None"
-
-    Attributes:
-        message -- explanation of the error
-    """
-
-    def __init__(self, message="DLL not loaded"):
-        self.message = message
-        super().__init__(self.message)
-
-class xmlNullPtr(Exception):
-    """Exception raised if "xmlDocPtr = NULL"
-
-    Attributes:
-        message -- explanation of the error
-    """
-
-    def __init__(self, message="XML Document pointer may not be NULL"):
-        self.message = message
-        super().__init__(self.message)
-
-class LibErr(Exception):
-    """Exception raised if xmlError is not NULL
-
-    Attributes:
-        err -- XML error structure
-    """
-
-    def __init__(self, err=None):
-        if err == None:
-            self.message = "undefined libxml2 error"
+class _threadSlot():     #   kept in a threading.local: dropped, and its weakref.finalize() called, when its thread ends
+    pass
+
+class xmlXPathCache():     #   LRU cache of compiled XPath expressions
+    '''
+    Maps an XPath expression string to its xmlXPathCompExpr, so libxml2 parses each expression once.
+    Bounded to "maxsize" entries, the least recently used expression is freed with xmlXPathFreeCompExpr.
+    "hits"/"misses"/"evictions" count lookups so the cache can be sized (approximately when threads race).
+    Each thread has its own entries, so a hit takes no lock and an expression is never freed while another
+    thread evaluates it. A thread's expressions are freed when it ends; clear() frees the calling thread's
+    at once and the other threads' on their next lookup.
+    '''
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0     #   bumped by clear()
+        self.local = threading.local()  #   "comps": OrderedDict exp: comp, "generation", "slot"
+
+    def __len__(self) -> int:   #   entries of the calling thread
+        comps = getattr(self.local, "comps", None)
+        return len(comps) if comps != None and self.local.generation == self.generation else 0
+
+    def get(self, exp: str) -> ctypes.c_void_p:    #   compiled expression, NULL if "exp" doesn't compile
+    #   The expression belongs to the calling thread's cache, use it before that thread's next lookup.
+        local = self.local
+        try:
+            comps = local.comps
+            if local.generation != self.generation: comps = self._reset()
+        except AttributeError: comps = self._reset()
+        comp = comps.get(exp)
+        if comp:
+            self.hits += 1
+            comps.move_to_end(exp)
+            return comp
+        self.misses += 1
+        with xmlMemTag("xpath-compiled"): comp = xmlXPathCompile(exp)
+        if not comp: return None    #   don't cache invalid expressions
+        comps[exp] = comp
+        if len(comps) > self.maxsize:
+            xmlXPathFreeCompExpr(comps.popitem(last=False)[1])
+            self.evictions += 1
+        return comp
+
+    def _reset(self) -> OrderedDict:    #   new (empty) entries for this thread, the previous ones freed
+        local = self.local
+        comps = getattr(local, "comps", None)
+        if comps != None: _freeCompExprs(comps)
         else:
-            e = err.contents
-            self.message = e.file.decode("utf-8") + " line:" + str(e.line) + " msg:" + e.message.decode("utf-8")
-        super().__init__(self.message)
-
-def xmlGetLastError () -> xmlError:
-# Get the last global error registered. This is per thread if compiled with thread support.
-# Returns:	NULL if no error occurred or a pointer to the error
-
-    global libXML
-# Check if DLL into memory. 
-    if libXML == None: raise NullDLL()
-
-# set up prototype
-    libXML.xmlGetLastError.restype = ctypes.POINTER(xmlError) # correct return type
-
-# wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    ErrPtr = libXML.xmlGetLastError()
-    if ErrPtr: return ErrPtr
-    else: return None
-
-def SetLibXmlPath(path: str):
-    global libXmlPath
-    libXmlPath = path
-
-def xmlReadFile (filename: str, encoding: str, options) -> xmlDoc:
-# parse an XML file from the filesystem or the network.
-#         filename:	a file or URL
-#         encoding:	the document encoding, or NULL
-#         options:	a combination of xmlParserOption
-#         Returns:	the resulting document tree
-    
-    global libXML
-# Load DLL into memory. 
-    if libXML == None:
-        global libXmlPath
-        if utils.os == 'Linux': libXML = ctypes.CDLL (libXmlPath)
-        else: libXML = ctypes.WinDLL (libXmlPath)
-
-# set up prototype
-    libXML.xmlReadFile.restype = ctypes.POINTER(xmlDoc) # correct return type
-    libXML.xmlReadFile.argtypes = ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int32
-
-# wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    pDoc = libXML.xmlReadFile(filename.encode(), encoding.encode(), options)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
-    return pDoc # return xmlDocPtr (xmlDoc*). Add ".contents" in calling program to dereference.
-
-def xmlReadMemory (XML: str, URL: str, encoding: str, options) -> xmlDoc:
-# parse an XML in-memory document and build a tree.
-#     buffer:   a pointer to a char array
-#     size:	    the size of the array
-#     URL:	    the base URL to use for the document
-#     encoding:	the document encoding, or NULL
-#     options:	a combination of xmlParserOption
-#     Returns:	the resulting document tree
-    
-    global libXML
-# Load DLL into memory. 
-    if libXML == None:
-        global libXmlPath
-        if utils.os == 'Linux': libXML = ctypes.CDLL (libXmlPath)
-        else: libXML = ctypes.WinDLL (libXmlPath)
-
-# set up prototype
-    libXML.xmlReadMemory.restype = ctypes.POINTER(xmlDoc) # correct return type
-    libXML.xmlReadMemory.argtypes = ctypes.c_char_p, ctypes.c_int32, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int32
-  
-# wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    pDoc = libXML.xmlReadMemory(XML.encode(), len(XML), URL.encode(), encoding.encode(), options)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
-    return pDoc # return xmlDocPtr (xmlDoc*). Add ".contents" in calling program to dereference.
-
-def xmlFreeDoc (cur: ctypes.c_void_p) :
-# Free up all the structures used by a document, tree included.
-#     cur:	pointer to the document
-
-# set up prototype
-    libXML.xmlFreeDoc.argtypes = ctypes.c_void_p,
-  
-# wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    libXML.xmlFreeDoc(cur)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
-    return
+            comps = local.comps = OrderedDict()
+            local.slot = _threadSlot()
+            weakref.finalize(local.slot, _freeCompExprs, comps)
+        local.generation = self.generation
+        return comps
 
-def xmlDocGetRootElement (doc: xmlDoc) -> xmlNode:
-# Get the root element of the document (doc->children is a list containing possibly comments, PIs, etc ...).
-#     doc:	the document
-#     Returns:	the #xmlNodePtr for the root or NULL
+    def clear(self):
+        self.generation += 1
+        if getattr(self.local, "comps", None) != None: self._reset()
 
-    if doc == None: raise xmlNullPtr("XML Document pointer may not be NULL")
-    global libXML
-# Check if DLL into memory. 
-    if libXML == None: raise NullDLL()
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
 
-# set up prototype
-    libXML.xmlDocGetRootElement.restype = ctypes.POINTER(xmlNode) # correct return type
-    libXML.xmlDocGetRootElement.argtypes = ctypes.c_void_p,
+def _freeCompExprs(comps: OrderedDict):
+    while comps: xmlXPathFreeCompExpr(comps.popitem()[1])
 
-# wrapping in c_char_p or c_int32 isn't required because .argtypes are known.
-    NodePtr = libXML.xmlDocGetRootElement(doc)
-    return NodePtr   #   return xmlNodePtr (xmlNode*). Add ".contents" in calling program to dereference.
+class xmlXPathResult():     #   owns an xmlXPathObject
+    '''
+    XPath result returned by xml.XPathEval. The xmlXPathObject is freed with xmlXPathFreeObject by free(),
+    on leaving a "with" block, or when the result is garbage collected, whichever comes first.
+    The result holds a reference to its xml document, so the xmlDoc can't be freed while the result is alive.
+    ".contents" works like on the raw xmlXPathObject pointer, so it can be passed to xmlNodePtrs()/xmlNodeArray().
+    '''
+    def __init__(self, ptr: xmlXPathObject, doc):
+        self.ptr = ptr
+        self.doc = doc
 
-def xmlXPathNewContext (doc: xmlDoc) -> xmlXPathParserContext:
-# Create a new xmlXPathContext
-#     doc:	the XML document
-#     Returns:	the xmlXPathContext just allocated. The caller will need to free it.
+    def __del__(self):
+        self.free()
 
-    if doc == None: raise xmlNullPtr("XML Document pointer may not be NULL")
-    global libXML
+    def __enter__(self):
+        return self
 
-# Check if DLL loaded. 
-    if libXML == None: raise NullDLL()
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.free()
 
-# set up prototype
-    libXML.xmlXPathNewContext.restype = ctypes.POINTER(xmlXPathParserContext) # correct return type
-    libXML.xmlXPathNewContext.argtypes = ctypes.c_void_p,
-    return libXML.xmlXPathNewContext(doc)
-    
-def xmlXPathFreeContext (ctxt: xmlXPathParserContext) :
-# Free up an xmlXPathContext
-#     ctxt:	the context to free
-
-# set up prototype
-    libXML.xmlXPathFreeContext.argtypes = ctypes.c_void_p,
-    libXML.xmlXPathFreeContext(ctxt)
-    Err = xmlGetLastError()
-    if Err: raise LibErr(Err)
-    return
+    def __bool__(self) -> bool:
+        return bool(self.ptr)
+
+    @property
+    def contents(self) -> xmlXPathObject:
+        if not self.ptr: raise xmlNullPtr("XPath result has been freed")
+        return self.ptr.contents
+
+    def free(self):     #   free the xmlXPathObject, node pointers taken from it are invalid afterwards
+        if self.ptr: xmlXPathFreeObject(self.ptr)
+        self.ptr = None
+        self.doc = None
+
+    def NodePtrs(self) -> array:    #   see xmlNodePtrs(); the array keeps this result (and its nodeset) alive
+        if not self.ptr: return numpy.empty(0, numpy.uintp)
+        x = self.ptr.contents.nodesetval
+        if not x: return numpy.empty(0, numpy.uintp)
+        ns = xmlNodeSet.from_address(x)
+        if ns.nodeNr == 0: return numpy.empty(0, numpy.uintp)
+        tab = (ctypes.c_size_t * ns.nodeNr).from_address(ctypes.cast(ns.nodeTab, ctypes.c_void_p).value)
+        tab.owner = self    #   the numpy view's base is "tab", so the xmlXPathObject isn't freed under it
+        return numpy.ctypeslib.as_array(tab).view(numpy.uintp)
+
+    def GetString(self) -> str:     #   string value, e.g. of "string(...)" expressions
+        p = self.contents.stringval
+        if p: return ctypes.string_at(p).decode('utf-8')
+        return None
+
+    def GetValue(self):     #   plain Python value: float, str, bool, or list of node string values
+        t = self.contents.type
+        if t == XPATH_TYPE.NUMBER: return self.contents.floatval
+        if t == XPATH_TYPE.STRING: return self.GetString()
+        if t == XPATH_TYPE.BOOLEAN: return bool(self.contents.boolval)
+        if t == XPATH_TYPE.NODESET: return [xmlNodeString(p) for p in self.NodePtrs().tolist()]
+        return None
+
+_nodeType = xmlNode.type.offset
+_nodeName = xmlNode.name.offset
+_nodeChildren = xmlNode.children.offset
+_nodeParent = xmlNode.parent.offset
+_nodeNext = xmlNode.next.offset
+_nodeProperties = xmlNode.properties.offset
+_nodeContent = xmlNode.content.offset
+_nodeWord = ctypes.sizeof(ctypes.c_void_p)
+_nodeFields = ctypes.c_void_p * (_nodeNext // _nodeWord + 1)    #   xmlNode/xmlAttr head up to "next", as pointer words
+_nodeTypeShift = 8 * (_nodeType % _nodeWord if sys.byteorder == "little" else _nodeWord - 4 - _nodeType % _nodeWord)
+
+def _xmlString(p) -> str:   #   decode and free a libxml2-allocated xmlChar*
+    if not p: return None
+    s = ctypes.string_at(p).decode('utf-8')
+    xml2.xmlFree(p)
+    return s
+
+def _attrValue(a: int) -> bytes:    #   value of an xmlAttr (address), read in place when it's one text node
+    t = ctypes.c_void_p.from_address(a + _nodeChildren).value
+    if not t: return b""
+    if not ctypes.c_void_p.from_address(t + _nodeNext).value: return ctypes.c_char_p.from_address(t + _nodeContent).value or b""
+    return (_xmlString(xml2.xmlNodeGetContent(a)) or "").encode()
+
+_xpathStep = r"(?:[A-Za-z_][\w.\-]*:)?(?:[A-Za-z_][\w.\-]*|\*)"
+_xpathChildPath = re.compile(rf"(?:{_xpathStep}/)*(?:@?{_xpathStep}|text\(\))")   #   "a/b/@c", "a/text()"...
+_xpathNumber = re.compile(rb"[ \t\r\n]*(-?(?:\d+\.?\d*|\.\d+)|-)(?:[eE]([+-]?\d+)?[+-]?)?[ \t\r\n]*")  #   what number() parses
+
+def _xpathFloat(v: bytes) -> float:     #   number() of a string, libxml2 reads "-" as -0 and "1e" as 1
+    m = _xpathNumber.fullmatch(v)
+    if not m: return numpy.nan
+    n, e = m.groups()
+    if n == b"-": n = b"-0"
+    return float(n + b"e" + e if e else n)
+
+_xpathNumberChars = numpy.zeros(256, bool)   #   within these, float() accepts what number() does (no "+5", "inf", "1_0")
+_xpathNumberChars[list(b"0123456789.-eE \t\r\n\0")] = True
+
+def _gather(addrs: array, offset: int, dtype=numpy.uintp) -> array:   #   the field at addr+offset, for every address
+    if len(addrs) == 0: return numpy.empty(0, dtype)
+    size = numpy.dtype(dtype).itemsize
+    lo, hi = int(addrs.min()) + offset, int(addrs.max()) + offset + size
+    span = (ctypes.c_char * (hi - lo)).from_address(lo)     #   only the fields themselves are read
+    if lo % size == 0 and not (addrs % size).any():     #   aligned, as malloc'ed nodes are
+        return numpy.frombuffer(span, dtype, (hi - lo) // size)[(addrs + offset - lo) // size]
+    return numpy.frombuffer(span, numpy.uint8)[(addrs + offset - lo).astype(numpy.intp)[:, None] + numpy.arange(size)].view(dtype).ravel()
 
-def xmlXPathEval (str: str, ctx: xmlXPathParserContext) -> xmlXPathObject:
-# Evaluate the XPath Location Path in the given context.
-#     str:	the XPath expression
-#     ctx:	the XPath context
-#     Returns:	the xmlXPathObjectPtr resulting from the evaluation or NULL. the caller has to free the object.
-
-#   Note: The reason I don't open/close a context ptr for each XPath is you may want to keep it around for multiple queries, or not
-    if ctx == None: raise xmlNullPtr("XPath context pointer may not be NULL")
-    global libXML
-# Check if DLL is loaded. 
-    if libXML == None: raise NullDLL()
-
-# set up prototype
-    libXML.xmlXPathEval.restype = ctypes.POINTER(xmlXPathObject) # correct return type
-    libXML.xmlXPathEval.argtypes = ctypes.c_char_p, ctypes.c_void_p,
-    return libXML.xmlXPathEval(str.encode() , ctx)
-
-def xmlNodeArray(xmlXPathObj: xmlXPathObject) -> array:
-    if not xmlXPathObj: return None # null XPath results
-    x = xmlXPathObj.contents.nodesetval
-    if not x: return None           # no nodeset
-    ns = ctypes.cast(x, ctypes.POINTER(xmlNodeSet)).contents
-    if ns.nodeNr == 0: return None  # empty nodeset
-    n = []
-    xmlNodePtr = ctypes.POINTER(xmlNode)
-    xmlNodePtrPtr = ctypes.POINTER(xmlNodePtr)
-    for i in range(ns.nodeNr):
-        p = ctypes.cast(ns.nodeTab + i*ctypes.sizeof(xmlNodePtr), 
-                            xmlNodePtrPtr)
-        print(p.contents.contents.name)
-        n.append(p.contents.contents)   #   dereference twice since pointer to pointer
-    return n   # return python array of NodeSet 
+class xmlNodeProxy():     #   node handle: the native pointer and its document, nothing else
+    '''
+    Lightweight handle for an xmlNode (or xmlAttr). Fields are read from the native struct on access,
+    and the iterators follow the children/next/properties pointers directly, without XPath.
+    Holds a reference to its xml document so the tree can't be freed while the handle exists.
+    '''
+    __slots__ = ("ptr", "doc")
+
+    def __init__(self, ptr: int, doc):
+        self.ptr = ptr
+        self.doc = doc
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, xmlNodeProxy) and other.ptr == self.ptr
+
+    def __hash__(self) -> int:
+        return hash(self.ptr)
+
+    def __repr__(self) -> str:
+        return f"<xmlNodeProxy {self.name} at {self.ptr:#x}>"
+
+    @property
+    def type(self) -> int:      #   XML_NODE_TYPE
+        return ctypes.c_int.from_address(self.ptr + _nodeType).value
+
+    @property
+    def name(self) -> str:
+        n = ctypes.c_char_p.from_address(self.ptr + _nodeName).value
+        if n: return n.decode('utf-8')
+        return None
+
+    @property
+    def content(self) -> str:   #   text content, including descendants
+        return _xmlString(xml2.xmlNodeGetContent(self.ptr))
+
+    @property
+    def line(self) -> int:
+        return xml2.xmlGetLineNo(self.ptr)
+
+    @property
+    def parent(self):
+        p = ctypes.c_void_p.from_address(self.ptr + _nodeParent).value
+        if p: return xmlNodeProxy(p, self.doc)
+        return None
+
+    def ToBytes(self, format: bool = False) -> bytes:   #   serialized subtree (UTF-8)
+        return self.doc.ToBytes(self, format=format)
+
+    def GetProp(self, name: str) -> str:    #   attribute value, None if not set
+        return _xmlString(xml2.xmlGetProp(self.ptr, name.encode()))
+
+    def children(self, type: int = None):   #   child nodes, optionally only one XML_NODE_TYPE
+        p = ctypes.c_void_p.from_address(self.ptr + _nodeChildren).value
+        return self._chain(p, type)
+
+    def siblings(self, type: int = None):   #   following siblings
+        p = ctypes.c_void_p.from_address(self.ptr + _nodeNext).value
+        return self._chain(p, type)
+
+    def attributes(self):   #   xmlAttr handles, use .name and .content
+        if self.type != XML_NODE_TYPE.ELEMENT: return
+        p = ctypes.c_void_p.from_address(self.ptr + _nodeProperties).value
+        yield from self._chain(p, None)
+
+    def descendants(self, type: int = None):    #   document order, without the node itself
+        view, doc, top, REF = _nodeFields.from_address, self.doc, self.ptr, XML_NODE_TYPE.ENTITY_REF
+        TYPE, SHIFT, CHILDREN, PARENT, NEXT = (_nodeType // _nodeWord, _nodeTypeShift, _nodeChildren // _nodeWord,
+                                               _nodeParent // _nodeWord, _nodeNext // _nodeWord)
+        p = view(top)[CHILDREN]
+        while p:
+            f = view(p)     #   the node's link fields, one read each
+            t = f[TYPE] >> SHIFT & 0xFFFFFFFF
+            if type == None or t == type: yield xmlNodeProxy(p, doc)
+            c = f[CHILDREN]
+            if c and t != REF:
+                p = c
+                continue
+            n = f[NEXT]
+            while not n:    #   up to the first ancestor with a next sibling
+                p = f[PARENT]
+                if p == top: return
+                f = view(p)
+                n = f[NEXT]
+            p = n
+
+    def _chain(self, p: int, type: int):    #   follow "next" links
+        view, doc, TYPE, SHIFT, NEXT = _nodeFields.from_address, self.doc, _nodeType // _nodeWord, _nodeTypeShift, _nodeNext // _nodeWord
+        while p:
+            f = view(p)
+            if type == None or f[TYPE] >> SHIFT & 0xFFFFFFFF == type: yield xmlNodeProxy(p, doc)
+            p = f[NEXT]
+
+def _xpathLiteral(s: str) -> str:     #   quote a string for use in an XPath expression
+    if "'" not in s: return f"'{s}'"
+    if '"' not in s: return f'"{s}"'
+    return "concat('" + "', \"'\", '".join(s.split("'")) + "')"
+
+def _freeThreadContext(ctxts: list, lock: threading.Lock, ctxt):   #   a thread's XPath context, unless its document freed it
+    with lock:
+        if ctxt not in ctxts: return
+        ctxts.remove(ctxt)
+    xmlXPathFreeContext(ctxt)
 
 class xml():     #   XML document
     pDoc: xmlDoc = None
     errno: int = 0
+    error: LibErr = None    #   why the last failed XPathEval returned None
     ctxt: xmlXPathParserContext = None
+    indexNames: tuple = ()      #   attributes indexed by Index(), empty if not enabled
+    index: dict = None          #   {attribute: {value: [node address, ...]}}, None when stale
+    hashes: dict = None         #   {element address: subtree hash + own hash}, see Fingerprint()
+    XPathCache = xmlXPathCache()    #   compiled expressions, shared by all documents
 
     def __init__(self, pDoc: xmlDoc):   #   create using LibXML2 document pointer
         self.pDoc = pDoc
+        self.local = threading.local()  #   "ctxt": this thread's XPath context, "slot": frees it when the thread ends
+        self.ctxts = []     #   contexts of the live threads, the rest freed with the document
+        self.ctxtLock = threading.Lock()
 
     def __del__(self):          #   free memory allocations
-        if self.ctxt: xmlXPathFreeContext(self.ctxt)
+        if hasattr(self, "ctxts"):
+            with self.ctxtLock:
+                ctxts = self.ctxts[:]
+                self.ctxts.clear()  #   the threads' finalizers find nothing left to free
+            for ctxt in ctxts: xmlXPathFreeContext(ctxt)
         if self.pDoc: xmlFreeDoc(self.pDoc)
 
+    def Root(self) -> xmlNodeProxy:     #   root element handle
+        if self.pDoc == None: return None
+        p = xml2.xmlDocGetRootElement(self.pDoc)
+        if p: return xmlNodeProxy(ctypes.addressof(p.contents), self)
+        return None
+
+    def Nodes(self, exp: str) -> list:  #   XPath nodeset as node handles (namespace nodes are skipped)
+        r = self.XPathEval(exp)
+        if not r: return []
+        with r:
+            return [xmlNodeProxy(p, self) for p in r.NodePtrs().tolist()
+                        if ctypes.c_int.from_address(p + _nodeType).value != XML_NODE_TYPE.NAMESPACE_DECL]
+
     def GetName(self) -> str:   #   Get document name
         if self.pDoc == None: return None
         if self.pDoc.contents.name: return self.pDoc.contents.name.decode('utf-8')
         return None
     
-    def context(self) -> xmlXPathParserContext: #   Get or create Parser context
+    def context(self) -> xmlXPathParserContext: #   Get or create this thread's XPath context
+    #   An XPath context isn't thread safe, so each thread querying the (read-only) document gets its own.
+        if self.pDoc == None: return None
+    #   The first context is kept with the document (as "ctxt"), the other threads' are freed when they end.
+        ctxt = getattr(self.local, "ctxt", None)
+        if ctxt == None:
+            with xmlMemTag("xpath-context", self.pDoc): ctxt = xmlXPathNewContext(self.pDoc)
+            with self.ctxtLock:
+                self.ctxts.append(ctxt)
+                first = self.ctxt == None
+                if first: self.ctxt = ctxt
+            if not first:
+                self.local.slot = _threadSlot()
+                weakref.finalize(self.local.slot, _freeThreadContext, self.ctxts, self.ctxtLock, ctxt)
+            self.local.ctxt = ctxt
+        return ctxt
+
+    def XPathEval(self, exp: str) -> xmlXPathResult:
+        if self.pDoc == None: return None
+        ctxt = getattr(self.local, "ctxt", None) or self.context()
+        try: state = xmlErrors.state    #   xmlCaptureErrors() inline
+        except AttributeError: state = LibXML._xmlErrorsSetup()
+        prev, state.errors = state.errors, []
+        try:
+            comp = self.XPathCache.get(exp)
+            if not comp: ans = None
+            elif xmlMem.enabled:
+                with xmlMemTag("xpath", self.pDoc): ans = xml2.xmlXPathCompiledEval(comp, ctxt)
+            else: ans = xml2.xmlXPathCompiledEval(comp, ctxt)
+        finally: errors, state.errors = state.errors, prev
+        if ans: return xmlXPathResult(ans, self)
+        self.error = max(errors, key=lambda e: e.level) if errors else LibErr(f"XPath evaluation failed: {exp}")
+        self.errno = self.error.code or ctxt.contents.error
+        return None
+
+    def Index(self, *names: str):
+        '''
+        Opt-in lookup index: maps the values of the named attributes to their elements, so Find() doesn't
+        scan the tree like "//*[@id='...']". Built in one XPath pass, dropped by the editing methods and
+        rebuilt on the next Find(). Index() without names disables it.
+        '''
+        self.indexNames = names
+        self.index = None
+
+    def _buildIndex(self):
+        names = self.indexNames
+        index = {name: {} for name in names}
+        if len(names) == 1: exp = f"//@{names[0]}"
+        else: exp = "//@*[" + " or ".join(f"name()='{n}'" for n in names) + "]"
+        r = self.XPathEval(exp)
+        if r:
+            with r:
+                for p in r.NodePtrs().tolist():     #   xmlAttr: parent element, name and value
+                    v = _attrValue(p).decode('utf-8')
+                    name = ctypes.c_char_p.from_address(p + _nodeName).value.decode('utf-8')
+                    index[name].setdefault(v, []).append(ctypes.c_void_p.from_address(p + _nodeParent).value)
+        self.index = index
+
+    def Find(self, name: str, value: str) -> list:
+        '''
+        Elements whose attribute "name" equals "value", as node handles in document order.
+        Uses the Index() when "name" is indexed, else the DTD ID table (xmlGetID) when the document
+        declares ID attributes, else an XPath scan.
+        '''
+        if self.pDoc == None: return []
+        if name in self.indexNames:
+            if self.index == None: self._buildIndex()
+            return [xmlNodeProxy(p, self) for p in self.index[name].get(value, ())]
+        if self.pDoc.contents.ids:
+            a = xml2.xmlGetID(self.pDoc, value.encode())
+            if a and ctypes.c_char_p.from_address(a + _nodeName).value == name.encode():
+                return [xmlNodeProxy(ctypes.c_void_p.from_address(a + _nodeParent).value, self)]
+        return self.Nodes(f"//*[@{name}={_xpathLiteral(value)}]")
+
+    def Fingerprint(self, node: xmlNodeProxy = None) -> bytes:
+        '''
+        Content hash of an element's subtree (the root element by default), 16 bytes. Equal subtrees hash
+        equal across documents: element names with their namespace URI, attributes in any order, text,
+        CDATA, comments and PIs count; whitespace-only text doesn't. The hashes of all elements are computed
+        in one walk of the native tree and kept until the document is edited.
+        '''
+        if self.hashes == None: self._hashTree()
+        if node == None: node = self.Root()
+        if node == None: return None
+        return self.hashes[node.ptr][:16]
+
+    def Diff(self, other, key: str = None, depth: int = None) -> list:
+        '''
+        Subtrees that differ between this (old) document and "other" (new), comparing Fingerprint()s top-down
+        so unchanged subtrees are skipped whole. Returns [(status, path, old node, new node), ...] with status
+            "changed"   the element's own name/attributes/text differ (or it's at "depth"), its subtree is reported once
+            "order"     its matched child elements are in another order; they're compared all the same, so moving
+                        one record reports the parent's order, not the whole document
+            "added"     only in "other", old node is None
+            "removed"   only in this document, new node is None
+        Child elements are matched by name and the value of attribute "key" (e.g. "id") when present, else by
+        position among same-named siblings. "path" is an XPath to the element, e.g. /orders/order[@id='7'].
+        depth: report differences at this element level at most (root is 0) instead of descending further.
+        '''
+        if self.hashes == None: self._hashTree()
+        if other.hashes == None: other._hashTree()
+        a, b = self.Root(), other.Root()
+        out = []
+        if a == None or b == None or a.name != b.name:
+            if a != None: out.append(("removed", f"/{a.name}", a, None))
+            if b != None: out.append(("added", f"/{b.name}", None, b))
+            return out
+
+        node, ELEMENT = xmlNode.from_address, XML_NODE_TYPE.ELEMENT
+        kb = key.encode() if key else None
+
+        def keyed(parent: int) -> dict:     #   child element addresses by (name, key value, occurrence)
+            children, seen = {}, {}
+            p = ctypes.c_void_p.from_address(parent + _nodeChildren).value
+            while p:
+                n = node(p)
+                if n.type == ELEMENT:
+                    v = None
+                    a = ctypes.c_void_p.from_address(p + _nodeProperties).value if kb else None
+                    while a:    #   the key attribute, read in place
+                        an = node(a)
+                        if an.name == kb:
+                            v = _attrValue(a).decode('utf-8')
+                            break
+                        a = an.next
+                    k = (n.name, v)
+                    i = seen[k] = seen.get(k, 0) + 1
+                    children[(n.name, v, i)] = p
+                p = n.next
+            return children
+
+        def step(name: bytes, v: str, i: int) -> str:
+            name = name.decode('utf-8')
+            if v == None: return f"{name}[{i}]"
+            return f"{name}[@{key}={_xpathLiteral(v)}]" + (f"[{i}]" if i > 1 else "")
+
+        proxy = lambda doc, p: xmlNodeProxy(p, doc)
+        pending = [(a.ptr, b.ptr, f"/{a.name}", 0)]
+        while pending:
+            a, b, path, level = pending.pop()
+            ha, hb = self.hashes[a], other.hashes[b]
+            if ha[:16] == hb[:16]: continue
+            if ha[16:] != hb[16:] or (depth != None and level >= depth):
+                out.append(("changed", path, proxy(self, a), proxy(other, b)))
+                continue
+            old, new = keyed(a), keyed(b)
+            found, reported = [], len(out)
+            if [k for k in old if k in new] != [k for k in new if k in old]:   #   matched children reordered
+                out.append(("order", path, proxy(self, a), proxy(other, b)))
+            for k, c in old.items():
+                if k not in new: out.append(("removed", f"{path}/{step(*k)}", proxy(self, c), None))
+            for k, c in new.items():
+                o = old.get(k)
+                if o == None: out.append(("added", f"{path}/{step(*k)}", None, proxy(other, c)))
+                elif self.hashes[o][:16] != other.hashes[c][:16]: found.append((o, c, f"{path}/{step(*k)}", level + 1))
+            if not found and len(out) == reported:  #   the hashes differ all the same: never report nothing for it
+                out.append(("changed", path, proxy(self, a), proxy(other, b)))
+            pending.extend(reversed(found))
+        return out
+
+    def _hashTree(self, strip: bool = True):
+    #   Merkle hashes: per element blake2b(own hash + child element hashes), own hash covers name, attributes
+    #   and text (with the number of child elements before it, so text/element order counts).
+        hashes = {}
+        root = xml2.xmlDocGetRootElement(self.pDoc) if self.pDoc else None
+        if not root:
+            self.hashes = hashes
+            return
+        node, string_at, blake2b = xmlNode.from_address, ctypes.string_at, hashlib.blake2b
+        ELEMENT, TEXT, CDATA, COMMENT, PI, REF = (XML_NODE_TYPE.ELEMENT, XML_NODE_TYPE.TEXT, XML_NODE_TYPE.CDATA_SECTION,
+                                                  XML_NODE_TYPE.COMMENT, XML_NODE_TYPE.PI, XML_NODE_TYPE.ENTITY_REF)
+
+        def qname(n: xmlNode) -> bytes:
+            if n.ns: return xmlNs.from_address(n.ns).href + b"}" + n.name
+            return n.name
+
+        def enter(p: int, n: xmlNode) -> list:  #   [address, own hasher, child hashes, next child]
+            h = blake2b(digest_size=16)
+            h.update(qname(n) + b"\0")
+            attrs = []
+            a = ctypes.c_void_p.from_address(p + _nodeProperties).value
+            while a:
+                an = node(a)
+                attrs.append((qname(an), _attrValue(a)))
+                a = an.next
+            for name, v in sorted(attrs): h.update(b"A%d:%s=%d:%s" % (len(name), name, len(v), v))
+            return [p, h, [], n.children]
+
+        stack = [enter(ctypes.addressof(root.contents), root.contents)]
+        while stack:
+            top = stack[-1]
+            c = top[3]
+            if c:
+                n = node(c)
+                top[3] = n.next
+                t = n.type
+                if t == ELEMENT:
+                    stack.append(enter(c, n))
+                    continue
+                if t == TEXT or t == CDATA or t == COMMENT or t == PI:
+                    text = string_at(n.content) if n.content else b""
+                    if t == TEXT and strip and not text.strip(): continue
+                    if t == PI: text = n.name + b" " + text
+                    top[1].update(b"%d@%d:%d:%s" % (t, len(top[2]), len(text), text))
+                elif t == REF: top[1].update(b"R@%d:%s" % (len(top[2]), n.name))
+                continue
+            stack.pop()
+            own = top[1].digest()
+            full = blake2b(own + b"".join(top[2]), digest_size=16).digest()
+            hashes[top[0]] = full + own
+            if stack: stack[-1][2].append(full)
+        self.hashes = hashes
+
+    def _changed(self):     #   called by every edit: drop what's derived from the tree
+        self.index = None
+        self.hashes = None
+
+    #   In-place editing. The XPath context and cached expressions stay valid; handles and XPath results
+    #   referring to a removed node (or its descendants) must not be used afterwards. Each edit drops the
+    #   Index() and the Fingerprint() hashes.
+    def NewChild(self, parent: xmlNodeProxy, name: str, content: str = None) -> xmlNodeProxy:  #   append a new element
+        self._changed()
+        p = xml2.xmlNewChild(parent.ptr, None, name.encode(), None)
+        if not p: raise LibErr(f"xmlNewChild failed for <{name}>")
+        if content != None: xml2.xmlNodeAddContent(p, content.encode())    #   plain text, no entity parsing
+        return xmlNodeProxy(p, self)
+
+    def AddChild(self, parent: xmlNodeProxy, node: xmlNodeProxy) -> xmlNodeProxy:  #   move "node" to the end of parent's children
+        self._changed()
+        xml2.xmlUnlinkNode(node.ptr)
+        p = xml2.xmlAddChild(parent.ptr, node.ptr)  #   adjacent text nodes are merged, "node" may be freed
+        if not p: raise LibErr("xmlAddChild failed")
+        return xmlNodeProxy(p, self)
+
+    def SetProp(self, node: xmlNodeProxy, name: str, value: str):   #   create or change an attribute
+        self._changed()
+        if not xml2.xmlSetProp(node.ptr, name.encode(), str(value).encode()): raise LibErr(f"xmlSetProp failed for {name}")
+
+    def RemoveProp(self, node: xmlNodeProxy, name: str) -> bool:    #   False if the attribute wasn't there
+        self._changed()
+        return xml2.xmlUnsetProp(node.ptr, name.encode()) == 0
+
+    def SetContent(self, node: xmlNodeProxy, text: str):    #   replace the children with a text node
+        self._changed()
+        xml2.xmlNodeSetContent(node.ptr, None)
+        if text: xml2.xmlNodeAddContent(node.ptr, text.encode())
+
+    def Remove(self, node: xmlNodeProxy):   #   unlink and free the node and its subtree
+        self._changed()
+        xml2.xmlUnlinkNode(node.ptr)
+        xml2.xmlFreeNode(node.ptr)
+        node.ptr = 0
+
+    def ToBytes(self, node: xmlNodeProxy = None, encoding: str = "UTF-8", format: bool = False) -> bytes:
+        '''
+        Serialize the document (xmlDocDumpFormatMemoryEnc) or one subtree (xmlNodeDump, UTF-8) straight
+        into a bytes object. format=True indents the output.
+        '''
         if self.pDoc == None: return None
-        if self.ctxt == None:  self.ctxt =  xmlXPathNewContext(self.pDoc)
-        return self.ctxt
+        if node != None:
+            buf = xml2.xmlBufferCreate()
+            try:
+                if xml2.xmlNodeDump(buf, self.pDoc, node.ptr, 0, int(format)) < 0: raise LibErr("xmlNodeDump failed")
+                return ctypes.string_at(xml2.xmlBufferContent(buf), xml2.xmlBufferLength(buf))
+            finally:
+                xml2.xmlBufferFree(buf)
+        out, size = ctypes.c_void_p(), ctypes.c_int()
+        xml2.xmlDocDumpFormatMemoryEnc(self.pDoc, ctypes.byref(out), ctypes.byref(size), encoding.encode(), int(format))
+        if not out: raise LibErr("xmlDocDumpFormatMemoryEnc failed")
+        try:
+            return ctypes.string_at(out, size.value)
+        finally:
+            xml2.xmlFree(out)
 
-    def XPathEval(self, exp: str) -> xmlXPathObject:
+    def ExtractColumns(self, rows: str, columns: dict) -> dict:
+        '''
+        Table extraction: for every node matching "rows", evaluate each column expression relative to it.
+            columns = {"id": ("@id", "i8"), "price": ("price", float), "name": "name"}
+        A column is an XPath expression, or (expression, dtype). Numeric dtypes are evaluated as number(...)
+        (NaN becomes 0 for integers), bool as boolean(...), anything else as string(...) into an object array.
+        Returns {column name: numpy array} with one entry per row.
+        A column of child/attribute steps ("@id", "price", "item/@sku", "name/text()") is evaluated once for all
+        rows as "(rows)/column"; the matches are mapped back to their rows through their parent pointers and the
+        values read straight from the text nodes. Per cell that leaves the string read (and number parse) in
+        Python, no libxml2 call. Other expressions ("count(item)", "item[2]", "../@id") cost a compiled
+        evaluation per cell, two libxml2 calls.
+        '''
         if self.pDoc == None: return None
-        ans = xmlXPathEval(exp, self.context())
-        if ans: return ans
-        self.errno = self.ctxt.contents.error
+        specs = []
+        for name, spec in columns.items():
+            exp, dtype = spec if isinstance(spec, tuple) else (spec, object)
+            dtype = numpy.dtype(dtype)
+            kind = "n" if dtype.kind in "iuf" else ("b" if dtype.kind == "b" else "s")
+            specs.append((name, dtype, kind, exp))
+        data = self._columns(rows, [(name, kind, exp) for name, dtype, kind, exp in specs])
+
+        out = {}
+        for (name, dtype, kind, exp), a in zip(specs, data):
+            if kind == "n" and dtype.kind != "f": a = numpy.nan_to_num(a, nan=0).astype(dtype)
+            elif kind == "n" or (kind == "s" and dtype.kind == "S"): a = a.astype(dtype)
+            elif kind == "s":
+                a = numpy.array([v.decode('utf-8') for v in a.tolist()], object)
+                if dtype.kind == "U": a = a.astype(dtype)
+            out[name] = a
+        return out
+
+    def _columns(self, rows: str, specs: list) -> list:
+    #   ExtractColumns values per (name, kind, expression): "n" float64, "b" bool, "s" object array of UTF-8 bytes
+        with xmlCaptureErrors() as errors:
+            r = self.XPathEval(rows)
+        if r == None:
+            xmlRaiseErrors(errors)
+            raise LibErr(f"Can't evaluate rows {rows}")
+        with r: ptrs = numpy.array(r.NodePtrs())
+        data, slow = [], []
+        for j, (name, kind, exp) in enumerate(specs):
+            a = self._childColumn(rows, ptrs, kind, exp) if len(ptrs) and _xpathChildPath.fullmatch(exp) else None
+            if a is None: slow.append(j)
+            data.append(a)
+        if slow:
+            for j, a in zip(slow, self._rowColumns(ptrs, [specs[j] for j in slow])): data[j] = a
+        return data
+
+    def _childColumn(self, rows: str, ptrs: array, kind: str, exp: str) -> array:
+    #   one column of child/attribute steps for all rows at once, None if the combined expression fails
+        r = self.XPathEval(f"({rows})/{exp}")
+        if r == None: return None
+        with r: found = numpy.array(r.NodePtrs())  #   document order, so a row's first match comes first
+        up = found
+        for step in range(exp.count("/") + 1): up = _gather(up, _nodeParent)
+        order = numpy.argsort(ptrs)
+        row = order[numpy.searchsorted(ptrs, up, sorter=order).clip(0, len(ptrs) - 1)] if len(up) else up.astype(numpy.intp)
+        if len(up) and not (ptrs[row] == up).all(): return None
+        row, first = numpy.unique(row, return_index=True)
+        if kind == "b":
+            a = numpy.zeros(len(ptrs), bool)
+            a[row] = True
+            return a
+
+        nodes = found[first]    #   string value of each row's first match: its text node's content, read in place
+        types = _gather(nodes, _nodeType, numpy.int32)
+        TEXT, CDATA = XML_NODE_TYPE.TEXT, XML_NODE_TYPE.CDATA_SECTION
+        own = (types == XML_NODE_TYPE.ELEMENT) | (types == XML_NODE_TYPE.ATTRIBUTE)
+        text = nodes.copy()
+        text[own] = _gather(nodes[own], _nodeChildren)
+        child = own & (text != 0)
+        t, nxt = _gather(text[child], _nodeType, numpy.int32), _gather(text[child], _nodeNext)
+        single = numpy.zeros(len(nodes), bool)
+        single[child] = ((t == TEXT) | (t == CDATA)) & (nxt == 0)
+        direct = single | (~own & ((types == TEXT) | (types == CDATA)))
+        content = numpy.zeros(len(nodes), numpy.uintp)
+        content[direct] = _gather(text[direct], _nodeContent)
+        values = numpy.empty(len(nodes), object)
+        values[:] = [v or b"" for v in (ctypes.c_char_p * len(content)).from_buffer(content)]   #   read by ctypes in C
+        for i in numpy.flatnonzero(~direct & (child | ~own)).tolist():  #   mixed content, entity references...
+            p = xml2.xmlNodeGetContent(int(nodes[i]))
+            values[i] = ctypes.string_at(p) if p else b""
+            if p: xml2.xmlFree(p)
+
+        if kind == "s":
+            a = numpy.full(len(ptrs), b"", object)
+            a[row] = values
+            return a
+        a = numpy.full(len(ptrs), numpy.nan)
+        values = values.tolist()
+        try:
+            if not _xpathNumberChars[numpy.frombuffer(b"\0".join(values), numpy.uint8)].all(): raise ValueError
+            a[row] = list(map(float, values))
+        except ValueError: a[row] = list(map(_xpathFloat, values))  #   some aren't numbers (NaN), or not for float()
+        return a
+
+    def _rowColumns(self, ptrs: array, specs: list) -> list:
+    #   columns evaluated per row, for expressions _childColumn() can't take: one compiled evaluation per cell
+        cols = []
+        try:
+            for name, kind, exp in specs:
+                exp = {"n": "number", "b": "boolean", "s": "string"}[kind] + f"({exp})"
+                with xmlCaptureErrors() as errors:
+                    comp = xmlXPathCompile(exp)     #   private copies, cache eviction can't free them mid-loop
+                if not comp: xmlRaiseErrors(errors)
+                cols.append((name, kind, comp))
+            out = [numpy.empty(len(ptrs), numpy.float64 if kind == "n" else (bool if kind == "b" else object))
+                        for name, kind, comp in cols]
+            ctxt = xmlXPathNewContext(self.pDoc)
+            SetNode, Eval, Free = xml2.xmlXPathSetContextNode, xml2.xmlXPathCompiledEval, xml2.xmlXPathFreeObject
+            string_at = ctypes.string_at
+            try:
+                with xmlCaptureErrors() as errors:
+                    for i, p in enumerate(ptrs.tolist()):
+                        SetNode(p, ctxt)
+                        for (name, kind, comp), a in zip(cols, out):
+                            obj = Eval(comp, ctxt)
+                            if not obj:     #   e.g. an unknown function, only found at evaluation
+                                xmlRaiseErrors(errors)
+                                raise LibErr(f"Can't evaluate column {name}")
+                            v = obj.contents
+                            if kind == "n": a[i] = v.floatval
+                            elif kind == "b": a[i] = v.boolval
+                            else: a[i] = string_at(v.stringval)
+                            Free(obj)
+            finally:
+                xml2.xmlXPathFreeContext(ctxt)
+        finally:
+            for name, kind, comp in cols: xmlXPathFreeCompExpr(comp)
+        return out
+
+xmlCTypes = {   #   C type names (as in PyXmlStructs.xlsm) for xmlBinding fields
+    "char": ctypes.c_byte, "signed char": ctypes.c_byte, "unsigned char": ctypes.c_ubyte, "bool": ctypes.c_bool,
+    "short": ctypes.c_short, "unsigned short": ctypes.c_ushort, "int": ctypes.c_int, "unsigned int": ctypes.c_uint,
+    "long": ctypes.c_long, "unsigned long": ctypes.c_ulong, "long long": ctypes.c_longlong,
+    "unsigned long long": ctypes.c_ulonglong, "float": ctypes.c_float, "double": ctypes.c_double,
+    "int8_t": ctypes.c_int8, "uint8_t": ctypes.c_uint8, "int16_t": ctypes.c_int16, "uint16_t": ctypes.c_uint16,
+    "int32_t": ctypes.c_int32, "uint32_t": ctypes.c_uint32, "int64_t": ctypes.c_int64, "uint64_t": ctypes.c_uint64,
+}
+
+def _fieldType(t) -> tuple:
+# (numpy dtype, ctypes type) of a field type: C name ("int", "char[16]"), ctypes type or numpy dtype
+    if isinstance(t, str) and t.strip() in xmlCTypes: t = xmlCTypes[t.strip()]
+    elif isinstance(t, str) and t.replace(" ", "").startswith("char[") and t.endswith("]"):
+        t = ctypes.c_char * int(t.replace(" ", "")[5:-1])
+    if isinstance(t, type) and issubclass(t, ctypes.Array) and t._type_ == ctypes.c_char:
+        return numpy.dtype(f"S{t._length_}"), t
+    if isinstance(t, type) and issubclass(t, ctypes._SimpleCData): return numpy.dtype(t), t
+    dtype = numpy.dtype(t)
+    if dtype.kind == "S": return dtype, ctypes.c_char * dtype.itemsize
+    return dtype, numpy.ctypeslib.as_ctypes_type(dtype)
+
+class xmlBinding():     #   XML records to C structures
+    '''
+    Compiled field map: one structure per element matching "rows", each field the value of an XPath relative to it.
+
+        b = xmlBinding("//order", [("id", "@id", "int"), ("price", "price", "double"), ("sku", "sku", "char[16]", 16)])
+        a = b.Extract(doc)              #   numpy structured array, b.dtype
+        s = b.ExtractStructs(doc)       #   ctypes array of b.Struct, same memory as "a"
+        b.Extract(doc, out=buffer)      #   fill existing memory, e.g. shared with C code
+
+    fields: (name, XPath, type[, offset]); type is a C type name from xmlCTypes or "char[N]", a ctypes type, or a
+    numpy dtype. Without offset a field follows the previous one with its natural C alignment. char[N] fields get
+    the UTF-8 string value, truncated (not terminated when full); numeric fields number(), NaN as 0 for integers.
+    itemsize: structure size, default the C sizeof (padded to the largest alignment).
+    The values are evaluated as in xml.ExtractColumns and written into the records as they come: the string
+    fields from the UTF-8 bytes, the numeric fields from the float64 number() values, cast on assignment.
+    '''
+    def __init__(self, rows: str, fields: list, itemsize: int = None):
+        self.rows = rows
+        self.columns = []   #   (name, kind, XPath) for xml._columns
+        names, formats, offsets, ctypesFields = [], [], [], []
+        end, align = 0, 1
+        for f in fields:
+            name, exp, t = f[:3]
+            dtype, ctype = _fieldType(t)
+            a = ctypes.alignment(ctype)
+            offset = f[3] if len(f) > 3 and f[3] != None else (end + a - 1) // a * a
+            names.append(name); formats.append(dtype); offsets.append(offset)
+            ctypesFields.append((offset, name, ctype))
+            self.columns.append((name, "s" if dtype.kind == "S" else ("b" if dtype.kind == "b" else "n"), exp))
+            end, align = max(end, offset + ctypes.sizeof(ctype)), max(align, a)
+        self.itemsize = itemsize or (end + align - 1) // align * align
+        if self.itemsize < end: raise ValueError(f"xmlBinding: itemsize {self.itemsize} smaller than the fields ({end})")
+        self.dtype = numpy.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": self.itemsize})
+
+        layout, pos = [], 0     #   ctypes layout: fields by offset, explicit padding, packed
+        for offset, name, ctype in sorted(ctypesFields, key=lambda f: f[0]):
+            if offset < pos: raise ValueError(f"xmlBinding: field {name} overlaps the previous field")
+            if offset > pos: layout.append((f"_pad{pos}", ctypes.c_char * (offset - pos)))
+            layout.append((name, ctype))
+            pos = offset + ctypes.sizeof(ctype)
+        if self.itemsize > pos: layout.append((f"_pad{pos}", ctypes.c_char * (self.itemsize - pos)))
+        self.Struct = type("xmlBindingStruct", (ctypes.Structure,), {"_pack_": 1, "_fields_": layout})
+
+    def Extract(self, doc: xml, out = None) -> array:
+        '''
+        Structured array with one record per row. "out": existing writable memory to fill instead (numpy
+        array, ctypes array, bytearray, mmap...), at least rows * itemsize bytes; the filled part is returned.
+        '''
+        if doc.pDoc == None: return None
+        cols = doc._columns(self.rows, self.columns)
+        n = len(cols[0]) if cols else 0
+        if out is None: a = numpy.zeros(n, self.dtype)
+        else:
+            buf = numpy.frombuffer(out, numpy.uint8)
+            if buf.size < n * self.itemsize: raise ValueError(f"xmlBinding: output holds {buf.size // self.itemsize} records, {n} needed")
+            a = buf[:n * self.itemsize].view(self.dtype)
+        for (name, kind, exp), values in zip(self.columns, cols):
+            if kind == "n" and self.dtype.fields[name][0].kind in "iu": numpy.nan_to_num(values, copy=False, nan=0)
+            a[name] = values    #   bytes truncated to the char[N] field, numbers cast to the field type
+        return a
+
+    def ExtractStructs(self, doc: xml):    #   ctypes array of Struct, sharing memory with the numpy result
+        a = self.Extract(doc)
+        if len(a) == 0: return (self.Struct * 0)()
+        return (self.Struct * len(a)).from_buffer(a)    #   "a" stays alive through the ctypes array's _objects
+
+class xmlReader():     #   streaming XML reader (xmlTextReader)
+    '''
+    Reads a file one node at a time instead of building the whole DOM, so memory stays bounded by
+    the largest expanded element, not the file size.
+
+        with xmlReader("export.xml") as r:
+            for e in r.elements("record", expand=True):
+                print(e.name, e.XPathEval("string(@id)").GetString())
+
+    elements() yields the reader itself, positioned on each matching element start tag. With expand=True
+    the element's subtree is built (xmlTextReaderExpand) and available as "node" and to XPathEval(), then
+    skipped so the reader can free it. Nodes and XPath results are only valid until the next element.
+    '''
+    reader: ctypes.c_void_p = None
+    ctxt: xmlXPathParserContext = None
+    node: xmlNode = None
+
+    def __init__(self, filename, encoding: str = "UTF-8", options: int = 0, schema = None):
+    #   filename: file name/URL, or a file-like object read through xmlReaderForIO (see xmlInputStream)
+        self.io = None
+        with xmlCaptureErrors() as errors:
+            if isinstance(filename, str):
+                self.reader = xml2.xmlReaderForFile(filename.encode(), encoding.encode(), xmlParseOptions(options))
+            else:
+                self.io = xmlInputStream(filename)
+                self.reader = xml2.xmlReaderForIO(self.io.read, self.io.close, None, None, encoding.encode(), xmlParseOptions(options))
+        if not self.reader:
+            if errors: xmlRaiseErrors(errors)
+            raise xmlNullPtr(f"Can't open XML reader for {filename}")
+        self.schema = schema    #   xmlSchema: validate while reading, see IsValid()
+        if schema != None:
+            if schema.kind == "rng": rc = xml2.xmlTextReaderRelaxNGSetSchema(self.reader, schema.schema)
+            else: rc = xml2.xmlTextReaderSetSchema(self.reader, schema.schema)
+            if rc != 0:
+                self.close()
+                raise LibErr(f"Can't attach schema {schema.path} to the reader")
+
+    def IsValid(self) -> bool:  #   schema validity of what has been read so far
+        return xml2.xmlTextReaderIsValid(self.reader) == 1
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        return self.elements()
+
+    def close(self):    #   free the context, reader and the document it's reading
+        if self.ctxt: xmlXPathFreeContext(self.ctxt)
+        if self.reader: xml2.xmlFreeTextReader(self.reader)
+        self.ctxt = None
+        self.reader = None
+        self.node = None
+
+    @property
+    def name(self) -> str:  #   qualified name of the current node
+        n = xml2.xmlTextReaderConstName(self.reader)
+        if n: return n.decode('utf-8')
+        return None
+
+    @property
+    def depth(self) -> int:
+        return xml2.xmlTextReaderDepth(self.reader)
+
+    def elements(self, tag: str = None, expand: bool = False):  #   generator over element start tags
+        if tag != None: tag = tag.encode()
+        reader = self.reader
+        Read, Next = xml2.xmlTextReaderRead, xml2.xmlTextReaderNext
+        NodeType, ConstName = xml2.xmlTextReaderNodeType, xml2.xmlTextReaderConstName
+        errors = []
+        scope = xmlCaptureErrors(errors)
+        move = Read     #   Next after an expanded element: skip the subtree, it's freed once the reader moves past it
+        while True:
+            with scope:     #   around the reader calls only, the consumer runs between them
+                rc = move(reader)
+                while rc == 1 and not (NodeType(reader) == XML_READER_TYPE.ELEMENT and (tag == None or ConstName(reader) == tag)):
+                    rc = Read(reader)
+                if rc == 1 and expand: self.node = xml2.xmlTextReaderExpand(reader)
+            if rc != 1: break
+            if expand:
+                if not self.node: xmlRaiseErrors(errors)
+                move = Next
+            yield self
+            self.node = None
+        if rc < 0:
+            if self.io != None and self.io.error != None: raise self.io.error
+            xmlRaiseErrors(errors)
+
+    def XPathEval(self, exp: str) -> xmlXPathResult:    #   evaluate relative to the expanded element
+        if not self.node: raise xmlNullPtr("No expanded element, use elements(expand=True)")
+        if self.ctxt == None: self.ctxt = xmlXPathNewContext(xml2.xmlTextReaderCurrentDoc(self.reader))
+        xml2.xmlXPathSetContextNode(self.node, self.ctxt)
+        comp = xml.XPathCache.get(exp)
+        ans = xmlXPathCompiledEval(comp, self.ctxt) if comp else None
+        if ans: return xmlXPathResult(ans, self)
         return None
 
+class xmlWriter():     #   streaming XML writer (xmlTextWriter)
+    '''
+    Writes XML incrementally, to a file (compressed with zlib level "compression" if > 0) or, without a
+    filename, to a memory buffer. Only the writer's small internal buffer is held, so output size
+    doesn't matter. For the memory target, drain() takes what has been written so far, and close() returns
+    the rest. Leaving a "with" block normally ends the document, closing any open elements, and closes
+    the writer: the rest of the output is then returned, once, by close() or drain().
+
+        with xmlWriter("report.xml") as w:
+            w.StartDocument()
+            w.StartElement("report")
+            for r in rows: w.WriteElement("row", str(r), id=r.id)
+            w.EndElement()
+    '''
+    writer: ctypes.c_void_p = None
+    buf: ctypes.c_void_p = None
+    tail: bytes = None      #   memory target: output taken from the freed buffer, not handed out by close()/drain() yet
+
+    def __init__(self, filename: str = None, compression: int = 0, indent: bool = False):
+        if filename != None:
+            self.writer = xml2.xmlNewTextWriterFilename(filename.encode(), compression)
+        else:
+            self.buf = xml2.xmlBufferCreate()
+            self.writer = xml2.xmlNewTextWriterMemory(self.buf, compression)
+        if not self.writer:
+            self.close()
+            raise xmlNullPtr(f"Can't create XML writer for {filename or 'memory buffer'}")
+        if indent: xml2.xmlTextWriterSetIndent(self.writer, 1)
+
+    def __del__(self):
+        self._free()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type == None and self.writer: xml2.xmlTextWriterEndDocument(self.writer)    #   close open elements
+        self._free()    #   the rest of the output stays in "tail" for close()/drain()
+
+    def _free(self):    #   flush and free the writer; the memory target's remaining output is added to "tail"
+        if self.writer: xml2.xmlFreeTextWriter(self.writer)  #   flushes
+        if self.buf:
+            self.tail = (self.tail or b"") + ctypes.string_at(xml2.xmlBufferContent(self.buf), xml2.xmlBufferLength(self.buf))
+            xml2.xmlBufferFree(self.buf)
+        self.writer = None
+        self.buf = None
+
+    def close(self) -> bytes:   #   flush and free the writer; returns the output not drained yet for the memory target
+    #   The output is handed out once: a later close() or drain() returns b"".
+        self._free()
+        data = self.tail
+        if data != None: self.tail = b""
+        return data
+
+    def check(self, rc: int, call: str) -> int:
+        if rc < 0: raise LibErr(f"{call} failed")
+        return rc
+
+    def drain(self) -> bytes:   #   memory target: output written so far (the closing output once closed), then emptied
+        if not self.writer:
+            data = self.tail or b""
+            if self.tail != None: self.tail = b""
+            return data
+        self.check(xml2.xmlTextWriterFlush(self.writer), "xmlTextWriterFlush")
+        data = ctypes.string_at(xml2.xmlBufferContent(self.buf), xml2.xmlBufferLength(self.buf))
+        xml2.xmlBufferEmpty(self.buf)
+        return data
+
+    def StartDocument(self, version: str = None, encoding: str = "UTF-8", standalone: str = None):
+        self.check(xml2.xmlTextWriterStartDocument(self.writer, version and version.encode(), encoding and encoding.encode(),
+                                                   standalone and standalone.encode()), "xmlTextWriterStartDocument")
+
+    def EndDocument(self):  #   closes all open elements
+        self.check(xml2.xmlTextWriterEndDocument(self.writer), "xmlTextWriterEndDocument")
+
+    def StartElement(self, name: str, **attrs):
+        self.check(xml2.xmlTextWriterStartElement(self.writer, name.encode()), "xmlTextWriterStartElement")
+        for k, v in attrs.items(): self.WriteAttribute(k, v)
+
+    def EndElement(self):
+        self.check(xml2.xmlTextWriterEndElement(self.writer), "xmlTextWriterEndElement")
+
+    def WriteAttribute(self, name: str, value):
+        self.check(xml2.xmlTextWriterWriteAttribute(self.writer, name.encode(), str(value).encode()), "xmlTextWriterWriteAttribute")
+
+    def WriteString(self, text: str):   #   escaped text content
+        self.check(xml2.xmlTextWriterWriteString(self.writer, text.encode()), "xmlTextWriterWriteString")
+
+    def WriteElement(self, name: str, text: str = None, **attrs):   #   complete element with attributes and text
+        if attrs:
+            self.StartElement(name, **attrs)
+            if text != None: self.WriteString(text)
+            self.EndElement()
+        else:
+            self.check(xml2.xmlTextWriterWriteElement(self.writer, name.encode(), text.encode() if text != None else None), "xmlTextWriterWriteElement")
+
+    def WriteComment(self, text: str):
+        self.check(xml2.xmlTextWriterWriteComment(self.writer, text.encode()), "xmlTextWriterWriteComment")
+
+class xmlSchema():     #   compiled W3C XML Schema (xsd) or RelaxNG (rng)
+    '''
+    The schema is parsed and compiled once, and is read-only afterwards, so one instance is shared by all
+    threads. Each thread validates with its own validation context, created on first use.
+    Use xmlLoadSchema() to get the cached instance for a file.
+
+        errors = xmlLoadSchema("order.xsd").Validate(doc)   #   [] if valid
+    '''
+    schema: ctypes.c_void_p = None
+
+    def __init__(self, path: str, kind: str = None):
+        self.path = path
+        self.kind = kind or ("rng" if path.lower().endswith((".rng", ".relaxng")) else "xsd")
+        if self.kind == "rng":
+            self.NewParserCtxt, self.Parse, self.FreeParserCtxt = xml2.xmlRelaxNGNewParserCtxt, xml2.xmlRelaxNGParse, xml2.xmlRelaxNGFreeParserCtxt
+            self.Free, self.NewValidCtxt, self.FreeValidCtxt = xml2.xmlRelaxNGFree, xml2.xmlRelaxNGNewValidCtxt, xml2.xmlRelaxNGFreeValidCtxt
+            self.ValidateDoc, self.SetErrors = xml2.xmlRelaxNGValidateDoc, xml2.xmlRelaxNGSetValidStructuredErrors
+        else:
+            self.NewParserCtxt, self.Parse, self.FreeParserCtxt = xml2.xmlSchemaNewParserCtxt, xml2.xmlSchemaParse, xml2.xmlSchemaFreeParserCtxt
+            self.Free, self.NewValidCtxt, self.FreeValidCtxt = xml2.xmlSchemaFree, xml2.xmlSchemaNewValidCtxt, xml2.xmlSchemaFreeValidCtxt
+            self.ValidateDoc, self.SetErrors = xml2.xmlSchemaValidateDoc, xml2.xmlSchemaSetValidStructuredErrors
+        self.local = threading.local()
+        self.ctxts = []
+        self.lock = threading.Lock()
+
+        with xmlCaptureErrors() as errors:
+            pctxt = self.NewParserCtxt(path.encode())
+            if not pctxt: raise xmlNullPtr(f"Can't create schema parser for {path}")
+            self.schema = self.Parse(pctxt)
+            self.FreeParserCtxt(pctxt)
+        if not self.schema: xmlRaiseErrors(errors)
+
+    def __del__(self):
+        for vctxt in self.ctxts: self.FreeValidCtxt(vctxt)
+        self.ctxts = []
+        if self.schema: self.Free(self.schema)
+        self.schema = None
+
+    def context(self) -> ctypes.c_void_p:   #   this thread's validation context
+        vctxt = getattr(self.local, "vctxt", None)
+        if vctxt == None:
+            vctxt = self.local.vctxt = self.NewValidCtxt(self.schema)
+            if not vctxt: raise xmlNullPtr("Can't create schema validation context")
+            self.SetErrors(vctxt, xmlErrorHandler, None)
+            with self.lock: self.ctxts.append(vctxt)
+        return vctxt
+
+    def Validate(self, doc: xml) -> list:   #   validation errors (LibErr), empty if the document is valid
+        with xmlCaptureErrors() as errors:
+            rc = self.ValidateDoc(self.context(), doc.pDoc)
+        if rc == 0: return []
+        if errors: return list(errors)
+        return [LibErr(f"{self.path}: validation failed ({rc})")]
+
+    def ValidateFile(self, filename: str, encoding: str = "UTF-8", options = 0) -> list:
+    #   streaming validation with xmlReader, no DOM is built for the whole file
+        with xmlReader(filename, encoding, options, schema=self) as r:
+            with xmlCaptureErrors() as errors:
+                while xml2.xmlTextReaderRead(r.reader) == 1: pass
+            if r.IsValid(): return []
+            if errors: return list(errors)
+            return [LibErr(f"{filename}: not valid against {self.path}")]
+
+xmlSchemas = {}     #   (path, kind): (mtime, xmlSchema)
+xmlSchemasLock = threading.Lock()
+
+def xmlLoadSchema(path: str, kind: str = None) -> xmlSchema:
+# compiled schema for a file, reused while the file is unchanged
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with xmlSchemasLock:
+        e = xmlSchemas.get((path, kind))
+        if e == None or e[0] != mtime:
+            e = xmlSchemas[(path, kind)] = (mtime, xmlSchema(path, kind))
+        return e[1]
+
+class xmlStylesheet():     #   compiled XSLT stylesheet (libxslt)
+    '''
+    The stylesheet is compiled once and only read by transforms (each xsltApplyStylesheet call has its own
+    transformation context), so one instance is shared by all threads. Use xmlLoadStylesheet() to get the
+    cached instance for a file.
+
+        out = xmlLoadStylesheet("normalize.xsl").Transform(doc, region="EU")    #   xml, query or ToBytes() it
+    '''
+    style: ctypes.c_void_p = None
+
+    def __init__(self, source):     #   file name/URL, xml document (copied), or str/bytes XSLT text
+        self.path = source if isinstance(source, str) and not source.lstrip().startswith("<") else None
+        with xsltCaptureErrors() as errors:
+            if self.path != None:
+                self.style = xslt.xsltParseStylesheetFile(source.encode())
+            else:
+                if isinstance(source, xml): pDoc = xml2.xmlCopyDoc(source.pDoc, 1)
+                else: pDoc = ctypes.cast(xmlReadMemory(source, "", "UTF-8", 0), ctypes.c_void_p).value
+                if not pDoc: raise xmlNullPtr("Can't copy the stylesheet document")
+                self.style = xslt.xsltParseStylesheetDoc(pDoc)     #   owns pDoc on success
+                if not self.style: xmlFreeDoc(pDoc)
+        if not self.style:
+            raise LibErr(" ".join(dict.fromkeys(e.message for e in errors)) or f"Can't compile stylesheet {self.path or ''}".rstrip())
+
+    def __del__(self):
+        if self.style: xslt.xsltFreeStylesheet(self.style)
+        self.style = None
+
+    def Transform(self, doc: xml, **params) -> xml:
+        '''
+        Apply the stylesheet, the result is a new native document. Parameters are passed to top-level xsl:param:
+        str values as strings, numbers/bool as XPath numbers/booleans.
+        '''
+        args = []
+        for name, v in params.items():
+            if isinstance(v, bool): v = "true()" if v else "false()"
+            elif isinstance(v, (int, float)): v = repr(v)
+            else: v = _xpathLiteral(str(v))
+            args += [name.encode(), v.encode()]
+        argv = (ctypes.c_char_p * (len(args) + 1))(*args, None)
+        with xsltCaptureErrors() as errors:
+            pDoc = xslt.xsltApplyStylesheet(self.style, doc.pDoc, argv)
+        if not pDoc:    #   libxslt reports an error in several messages
+            raise LibErr(" ".join(dict.fromkeys(e.message for e in errors)) or f"XSLT transform failed {self.path or ''}".rstrip())
+        return xml(pDoc)
+
+    def ToBytes(self, result: xml) -> bytes:    #   serialize a Transform() result as xsl:output says (method, encoding, indent)
+        out, size = ctypes.c_void_p(), ctypes.c_int()
+        if xslt.xsltSaveResultToString(ctypes.byref(out), ctypes.byref(size), result.pDoc, self.style) != 0:
+            raise LibErr("xsltSaveResultToString failed")
+        if not out: return b""
+        try:
+            return ctypes.string_at(out, size.value)
+        finally:
+            xml2.xmlFree(out)
+
+xmlStylesheets = {}     #   path: (mtime, xmlStylesheet)
+xmlStylesheetsLock = threading.Lock()
+
+def xmlLoadStylesheet(path: str) -> xmlStylesheet:
+# compiled stylesheet for a file, reused while the file is unchanged (imports/includes aren't checked)
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with xmlStylesheetsLock:
+        e = xmlStylesheets.get(path)
+        if e == None or e[0] != mtime:
+            e = xmlStylesheets[path] = (mtime, xmlStylesheet(path))
+        return e[1]
+
+class xmlPushParser():     #   incremental parser (xmlCreatePushParserCtxt/xmlParseChunk)
+    '''
+    Builds a document from chunks as they arrive, e.g. from a socket or pipe, so parsing overlaps with I/O
+    and the payload is never held in memory a second time.
+
+        p = xmlPushParser()
+        while chunk := sock.recv(65536): p.feed(chunk)
+        x = p.close()
+    '''
+    ctxt: xmlParserCtxt = None
+
+    def __init__(self, URL: str = "", options: int = 0):
+        self.ctxt = xml2.xmlCreatePushParserCtxt(None, None, None, 0, URL.encode() if URL else None)
+        if not self.ctxt: raise xmlNullPtr("Can't create push parser context")
+        if options: xml2.xmlCtxtUseOptions(self.ctxt, xmlParseOptions(options))
+
+    def __del__(self):
+        self.free()
+
+    def free(self):     #   free the parser context, and the partial document if close() wasn't reached
+        if self.ctxt:
+            if self.ctxt.contents.myDoc: xml2.xmlFreeDoc(self.ctxt.contents.myDoc)
+            xml2.xmlFreeParserCtxt(self.ctxt)
+        self.ctxt = None
+
+    def feed(self, data):   #   parse the next chunk, bytes or any buffer-protocol object (see BufferPtr)
+        if not self.ctxt: raise xmlNullPtr("Push parser is closed")
+        ptr, size, owner = BufferPtr(data)
+        if xml2.xmlParseChunk(self.ctxt, ptr, size, 0): self.error()
+
+    def close(self) -> xml:     #   end of input, returns the parsed document
+        if not self.ctxt: raise xmlNullPtr("Push parser is closed")
+        if xml2.xmlParseChunk(self.ctxt, None, 0, 1) or not self.ctxt.contents.wellFormed: self.error()
+        pDoc = ctypes.cast(self.ctxt.contents.myDoc, ctypes.POINTER(xmlDoc))
+        self.ctxt.contents.myDoc = None     #   the xml object owns it now
+        self.free()
+        return xml(pDoc)
+
+    def error(self):
+        Err = xml2.xmlCtxtGetLastError(self.ctxt)
+        e = LibErr(Err)     #   the error belongs to the context, read it before freeing
+        self.free()
+        raise e
+
+def xmlParseBatch(sources, encoding: str = "UTF-8", options: int = 0, workers: int = None) -> list:
+    '''
+    Parse many documents concurrently on a thread pool (ctypes releases the GIL during the libxml2 call).
+    A str source is a file name or URL (xmlCtxtReadFile), anything else is an in-memory buffer (xmlCtxtReadMemory).
+    Returns one entry per source, in input order: the xml document, or the LibErr for that document.
+    Each thread parses with its own parser context, so errors come from xmlCtxtGetLastError, not the global error.
+    '''
+    options = xmlParseOptions(options)
+    local = threading.local()
+    ctxts = []
+    lock = threading.Lock()
+
+    def parse(src):
+        ctxt = getattr(local, "ctxt", None)
+        if ctxt == None:
+            ctxt = local.ctxt = xml2.xmlNewParserCtxt()
+            with lock: ctxts.append(ctxt)
+        if isinstance(src, str):
+            with xmlMemDocTag(src) as t: pDoc = t.doc(xml2.xmlCtxtReadFile(ctxt, src.encode(), encoding.encode(), options))
+        else:
+            ptr, size, owner = BufferPtr(src)
+            with xmlMemDocTag("<memory>") as t: pDoc = t.doc(xml2.xmlCtxtReadMemory(ctxt, ptr, size, None, encoding.encode(), options))
+        if not pDoc:
+            Err = xml2.xmlCtxtGetLastError(ctxt)
+            return LibErr(Err)
+        return xml(pDoc)
+
+    def parseChunk(chunk):
+        return [parse(src) for src in chunk]
+
+    sources = list(sources)
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)     #   ThreadPoolExecutor's default
+    step = max(1, len(sources) // (workers * 4))    #   a few chunks per thread, not one future per document
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = []
+            for r in pool.map(parseChunk, [sources[i:i + step] for i in range(0, len(sources), step)]): results += r
+            return results
+    finally:
+        for ctxt in ctxts: xml2.xmlFreeParserCtxt(ctxt)
+
+class xmlDictParser():     #   parse a family of documents against one shared xmlDict
+    '''
+    libxml2 interns element/attribute names (and small text with XML_PARSE.COMPACT) in a dictionary.
+    Normally every document gets its own; documents parsed here share one, so the names of thousands of
+    same-schema documents are stored once. Each document keeps a reference to the dictionary, so it
+    stays valid after free(). One parser context is reused, calls to parse() are serialized.
+
+        p = xmlDictParser(options="lean")
+        docs = [p.parse(path) for path in paths]
+    '''
+    dict: ctypes.c_void_p = None
+    ctxt: xmlParserCtxt = None
+
+    def __init__(self, encoding: str = "UTF-8", options = "lean"):
+        self.encoding = encoding.encode()
+        self.options = xmlParseOptions(options) & ~XML_PARSE.NODICT
+        self.lock = threading.Lock()
+        self.dict = xml2.xmlDictCreate()
+        self.ctxt = xml2.xmlNewParserCtxt()
+        if not self.dict or not self.ctxt:
+            self.free()
+            raise xmlNullPtr("Can't create parser dictionary/context")
+        c = self.ctxt.contents
+        if c.dict: xml2.xmlDictFree(c.dict)     #   swap the context's own dictionary for the shared one
+        c.dict = self.dict
+        xml2.xmlDictReference(self.dict)
+
+    def __del__(self):
+        self.free()
+
+    def free(self):     #   release the parser's references, parsed documents hold their own
+        if self.ctxt: xml2.xmlFreeParserCtxt(self.ctxt)
+        if self.dict: xml2.xmlDictFree(self.dict)
+        self.ctxt = None
+        self.dict = None
+
+    def size(self) -> int:  #   number of strings in the shared dictionary
+        return xml2.xmlDictSize(self.dict)
+
+    def parse(self, src) -> xml:    #   file name/URL (str) or buffer
+        with self.lock:
+            if isinstance(src, str):
+                with xmlMemDocTag(src) as t: pDoc = t.doc(xml2.xmlCtxtReadFile(self.ctxt, src.encode(), self.encoding, self.options))
+            else:
+                ptr, size, owner = BufferPtr(src)
+                with xmlMemDocTag("<memory>") as t: pDoc = t.doc(xml2.xmlCtxtReadMemory(self.ctxt, ptr, size, None, self.encoding, self.options))
+            if not pDoc:
+                Err = xml2.xmlCtxtGetLastError(self.ctxt)
+                raise LibErr(Err)
+        return xml(pDoc)
+
+class mallinfo2(ctypes.Structure):   #   glibc malloc statistics
+    _fields_ = [(f, ctypes.c_size_t) for f in ("arena", "ordblks", "smblks", "hblks", "hblkhd", "usmblks", "fsmblks", "uordblks", "fordblks", "keepcost")]
+
+def HeapUsed() -> int:
+# Bytes currently allocated through malloc (where libxml2 allocates), None if not available (non-glibc).
+# Process wide: heap chunks plus mmapped chunks (large blocks, e.g. big text nodes).
+    global libC
+    if libC == None:
+        try:
+            libC = ctypes.CDLL(None)
+            libC.mallinfo2.restype = mallinfo2
+        except (OSError, AttributeError, TypeError):
+            libC = False
+    if not libC: return None
+    m = libC.mallinfo2()
+    return m.uordblks + m.hblkhd
+libC = None
+
+class xmlDocCache():     #   parsed documents keyed by path, size and mtime
+    '''
+    Cache in front of xmlReadFile for files read again and again (configuration, lookup tables).
+    An entry is reused while the file's size and mtime are unchanged. Entries are charged the bytes libxml2
+    allocated for them: counted exactly with xmlMemInstrument(), else estimated from malloc statistics (process
+    wide, so allocations of other threads during the parse are included), else the file size. Least recently
+    used entries are dropped while the total is over "budget".
+    A miss is parsed outside the cache lock, so hits on other paths don't wait; concurrent misses on the
+    same path wait for the one parse.
+    get() hands out the cached xml object itself; an evicted document is freed by xml.__del__ only once
+    the last caller drops it.
+    '''
+    def __init__(self, budget: int = 256 * 2**20, encoding: str = "UTF-8", options = 0):
+        self.budget = budget
+        self.encoding = encoding
+        self.options = options
+        self.docs = OrderedDict()   #   path: (size, mtime, xml, bytes)
+        self.loading = {}   #   path: Event, set when the parse in progress ends
+        self.resident = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def get(self, path: str) -> xml:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        while True:
+            with self.lock:
+                e = self.docs.get(path)
+                if e != None:
+                    if e[0] == st.st_size and e[1] == st.st_mtime_ns:
+                        self.hits += 1
+                        self.docs.move_to_end(path)
+                        return e[2]
+                    self.drop(path)     #   stale
+                busy = self.loading.get(path)
+                if busy == None:
+                    busy = self.loading[path] = threading.Event()
+                    self.misses += 1
+                    break
+            busy.wait()     #   another thread is parsing this path, then look again
+
+        try:
+            x, size = self._parse(path, st)
+        finally:
+            with self.lock: del self.loading[path]
+            busy.set()
+        with self.lock:
+            self.docs[path] = (st.st_size, st.st_mtime_ns, x, size)
+            self.resident += size
+            while self.resident > self.budget and len(self.docs) > 1:
+                self.drop(next(iter(self.docs)))
+                self.evictions += 1
+        return x
+
+    def _parse(self, path: str, st) -> tuple:  #   (xml, bytes charged)
+        if xmlMem.enabled:   #   exact: the blocks allocated under this entry's own tag
+            tag = f"doc-cache:{path}@{st.st_mtime_ns}"
+            with xmlCaptureErrors() as errors, LibXmlBind._xmlMemTag(tag):
+                pDoc = xml2.xmlReadFile(path.encode(), self.encoding.encode(), xmlParseOptions(self.options))
+            if not pDoc: xmlRaiseErrors(errors)
+            return xml(pDoc), xmlMemSnapshot()["tags"].get(tag, {"bytes": 0})["bytes"]
+        before = HeapUsed()
+        x = xml(xmlReadFile(path, self.encoding, self.options))
+        if before == None: return x, st.st_size
+        return x, max(HeapUsed() - before, 0)
+
+    def drop(self, path: str):  #   remove an entry, the document is freed when no caller holds it anymore
+        e = self.docs.pop(path, None)
+        if e != None: self.resident -= e[3]
+
+    def clear(self):
+        with self.lock:
+            self.docs.clear()
+            self.resident = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self.docs), "resident_bytes": self.resident, "budget": self.budget, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+def xmlExtractInit(path: str):     #   process pool initializer: same libxml2 as the parent, loaded once
+    SetLibXmlPath(path)
+    LoadLibXml()
+
+def xmlExtract(chunk: list, xpaths: list, encoding: str, options: int) -> list:  #   runs in the worker process
+    results = []
+    for src in chunk:
+        try:
+            if isinstance(src, str): x = xml(xmlReadFile(src, encoding, options))
+            else: x = xml(xmlReadMemory(src, "", encoding, options))
+            row = []
+            for exp in xpaths:
+                r = x.XPathEval(exp)
+                if r:
+                    with r: row.append(r.GetValue())
+                else: row.append(None)
+            results.append(row)
+        except LibErr as e:
+            results.append(e)
+    return results
+
+def xmlExtractPool(sources, xpaths: list, processes: int = None, chunksize: int = 64, encoding: str = "UTF-8", options: int = 0) -> list:
+    '''
+    Parse documents and evaluate a fixed list of XPath expressions in a pool of worker processes,
+    for jobs where the Python side, not libxml2, is the bottleneck.
+    Sources are file names (str) or buffers, handed to the workers "chunksize" at a time. Each worker loads
+    libxml2 from the current SetLibXmlPath() setting once. Only the extracted values are sent back:
+    one list per source, in input order, with a value per expression (see xmlXPathResult.GetValue),
+    or the LibErr for a document that failed to parse.
+    '''
+    sources = list(sources)
+    chunks = [sources[i:i + chunksize] for i in range(0, len(sources), chunksize)]
+    results = []
+    with ProcessPoolExecutor(max_workers=processes, initializer=xmlExtractInit, initargs=(LibXmlBind.libXmlPath,)) as pool:
+        for r in pool.map(xmlExtract, chunks, [xpaths] * len(chunks), [encoding] * len(chunks), [options] * len(chunks)):
+            results += r
+    return results
+
 def test():
+    from PyQt5.QtWidgets import (
+        QApplication, 
+        QFileDialog
+    )
     app = QApplication(sys.argv)
     FileObj = QFileDialog.getOpenFileName(None, "Select XML file to load", None, "XML (*.xml)")
 
@@ -401,9 +1503,10 @@ def test():
     NodeSet = xmlNodeArray(XPathObj)
     for n in NodeSet:
         print(n.name)
+    xmlXPathFreeObject(XPathObj)
     xmlXPathFreeContext(ctxt)
-    if pDoc : xmlFreeDoc(pDoc)
+    del x       #   x owns pDoc
 
     return
 
-test()
\ No newline at end of file
+if __name__ == "__main__": test()